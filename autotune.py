@@ -0,0 +1,212 @@
+'''
+This is the startup autotuner choosing the precision of each model.
+
+The precision variants of a model are the directories of models/intel/<model>/ (FP32, FP16, FP16-INT8...) holding
+its IR files. Each variant is loaded on the device of its stage and timed on synthetic inputs of the right shape.
+With a reference clip, the variants are also checked against the FP32 precision : the four FP32 models run on
+some frames of the clip, then each variant runs on the same inputs as the FP32 model of its stage, and its relative
+error must stay within the tolerance :
+- face detection : mean difference of the face box, as a ratio of the frame size,
+- facial landmarks : mean difference of the landmarks, as a ratio of the face width,
+- head pose : mean difference of the angles, as a ratio of 90 degrees,
+- gaze : mean angle between the gaze vectors, as a ratio of 90 degrees.
+The fastest acceptable variant of each stage is kept, and the decision is saved in a cache file : it is reused
+by the next launches as long as the device, the execution settings and the variants files do not change.
+
+Sample usage:
+    paths = Autotuner('autotune.json', clip='resources/example.mp4').tune(model_paths, execution_settings)
+'''
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+import execution_config
+import inference_core
+from face_detection import Face_Detection
+from facial_landmarks_detection import Facial_Landmarks_Detection
+from gaze_estimation import Gaze_Estimation
+from head_pose_estimation import Head_Pose_Estimation
+from pipeline import Serial_Pipeline
+
+STAGES = {'face_detection': Face_Detection, 'landmarks': Facial_Landmarks_Detection,
+          'head_pose': Head_Pose_Estimation, 'gaze': Gaze_Estimation}
+REFERENCE_PRECISION = 'FP32'
+ITERATIONS = 50
+TOLERANCE = 0.05
+CLIP_FRAMES = 20
+
+
+def find_variants(model_path):
+    '''
+    Return the dict of precision -> path (without extension) of the variants of a model,
+    given the path of one of them (models/intel/<model>/<precision>/<model>).
+    '''
+    name = os.path.basename(model_path)
+    root = os.path.dirname(os.path.dirname(model_path))
+    variants = {}
+    if os.path.isdir(root):
+        for precision in sorted(os.listdir(root)):
+            path = os.path.join(root, precision, name)
+            if os.path.isfile(path + '.xml'):
+                variants[precision] = path
+    if not variants:
+        variants[os.path.basename(os.path.dirname(model_path))] = model_path
+    return variants
+
+
+def files_signature(variants):
+    '''
+    Return the size and modification time of the IR files of the variants, to know if they changed.
+    '''
+    signature = {}
+    for precision, path in variants.items():
+        signature[precision] = [[os.path.getsize(file), os.path.getmtime(file)] if os.path.isfile(file) else None
+                                for file in (path + '.xml', path + '.bin')]
+    return signature
+
+
+def relative_error(stage, model, result):
+    '''
+    Return the relative error of the model output on the inputs of the reference result.
+    '''
+    if stage == 'face_detection':
+        model.start_async(result.frame)
+        box = model.get_face_box(result.frame, model.wait())
+        if box is None:
+            return 1.0
+        height, width = result.frame.shape[:2]
+        return float(np.mean(np.abs(np.subtract(box, result.face_box)) / (width, height, width, height)))
+    if stage == 'landmarks':
+        landmarks = model.predict(result.frame, result.face_box)[2]
+        return float(np.mean(np.abs(landmarks - result.landmarks)) / result.face_box[2])
+    if stage == 'head_pose':
+        angles = model.predict(result.frame, result.face_box)
+        return float(np.mean(np.abs(np.ravel(angles) - np.ravel(result.head_pose_angles))) / 90)
+    gaze_vector = model.predict(result.frame, result.left_eye_box, result.right_eye_box, result.head_pose_angles)
+    cosine = np.dot(gaze_vector, result.gaze_vector) / max(np.linalg.norm(gaze_vector) * np.linalg.norm(result.gaze_vector),
+                                                            1e-9)
+    return float(np.degrees(np.arccos(np.clip(cosine, -1, 1))) / 90)
+
+
+class Autotuner:
+    def __init__(self, cache_file, clip=None, tolerance=TOLERANCE, iterations=ITERATIONS, extensions=None,
+                 clip_frames=CLIP_FRAMES):
+        self.cache_file = cache_file
+        self.clip = clip
+        self.tolerance = tolerance
+        self.iterations = iterations
+        self.extensions = extensions
+        self.clip_frames = clip_frames
+        self.cache = {}
+        if cache_file is not None and os.path.isfile(cache_file):
+            with open(cache_file) as cache:
+                self.cache = json.load(cache)
+        # results of the FP32 models on the reference clip, computed when first needed
+        self.reference_results = None
+
+    def tune(self, model_paths, settings):
+        '''
+        Return the dict of stage -> model path of the fastest acceptable variants, given the dict of
+        stage -> default model path and the execution settings of each stage.
+        '''
+        # the variants and reference models loaded here are not the models of the run : they are left out of the
+        # warm start summary
+        reports_count = len(inference_core.load_reports)
+        paths = {}
+        for stage, model_path in model_paths.items():
+            variants = find_variants(model_path)
+            if len(variants) == 1:
+                paths[stage] = next(iter(variants.values()))
+                continue
+            key = json.dumps([stage, settings[stage], sorted(variants.items()), self.clip, self.tolerance])
+            decision = self.cache.get(key)
+            if decision is None or decision['files'] != files_signature(variants):
+                decision = self.tune_stage(stage, variants, settings, model_paths)
+                decision['files'] = files_signature(variants)
+                self.cache[key] = decision
+                self.save()
+                print("Autotune of", stage, ":", decision['precision'], "chosen")
+            else:
+                print("Autotune of", stage, ":", decision['precision'], "(from the cache)")
+            for precision, measure in decision['variants'].items():
+                error = "{:.4f}".format(measure['error']) if 'error' in measure else "-"
+                print("    {:<12} latency {:8.3f} ms / relative error {}".format(precision, measure['latency'] * 1000,
+                                                                               error))
+            paths[stage] = variants[decision['precision']]
+        del inference_core.load_reports[reports_count:]
+        return paths
+
+    def tune_stage(self, stage, variants, settings, model_paths):
+        '''
+        Measure the variants of a stage and return the decision.
+        '''
+        measures = {}
+        for precision, path in variants.items():
+            model = self.load(stage, path, settings[stage])
+            measure = {'latency': self.measure_latency(model)}
+            if self.clip is not None and precision != REFERENCE_PRECISION:
+                results = self.get_reference_results(model_paths, settings)
+                if results:
+                    measure['error'] = float(np.mean([relative_error(stage, model, result) for result in results]))
+            measures[precision] = measure
+        acceptable = [precision for precision, measure in measures.items()
+                      if measure.get('error', 0.0) <= self.tolerance]
+        if not acceptable:
+            # only the reference precision is always acceptable
+            acceptable = [REFERENCE_PRECISION] if REFERENCE_PRECISION in measures else list(measures)
+        precision = min(acceptable, key=lambda precision: measures[precision]['latency'])
+        return {'precision': precision, 'variants': measures}
+
+    def load(self, stage, path, settings):
+        model = STAGES[stage](path, settings['device'], self.extensions)
+        model.load_model(1, 1, execution_config.plugin_config(settings))
+        return model
+
+    def measure_latency(self, model):
+        '''
+        Return the median time of an inference of the model on random inputs.
+        '''
+        inputs = {name: np.random.rand(*info.shape).astype(np.float32) for name, info in model.model.inputs.items()}
+        # the first inference is slower
+        model.net.infer(inputs)
+        times = []
+        for _ in range(self.iterations):
+            start = time.time()
+            model.net.infer(inputs)
+            times.append(time.time() - start)
+        return float(np.median(times))
+
+    def get_reference_results(self, model_paths, settings):
+        '''
+        Return the results of the FP32 models on frames spread over the reference clip, where a gaze vector was found.
+        '''
+        if self.reference_results is not None:
+            return self.reference_results
+        models = {}
+        for stage, model_path in model_paths.items():
+            variants = find_variants(model_path)
+            models[stage] = self.load(stage, variants.get(REFERENCE_PRECISION, model_path), settings[stage])
+        pipeline = Serial_Pipeline(models['face_detection'], models['landmarks'], models['head_pose'], models['gaze'])
+        capture = cv2.VideoCapture(self.clip)
+        frames_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.reference_results = []
+        for index in np.linspace(0, max(frames_count - 1, 0), self.clip_frames).astype(int):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, frame = capture.read()
+            if not ok:
+                continue
+            result = pipeline.submit(frame)[0]
+            if result.gaze_vector is not None:
+                self.reference_results.append(result)
+        capture.release()
+        return self.reference_results
+
+    def save(self):
+        if self.cache_file is None:
+            return
+        with open(self.cache_file + '.tmp', 'w') as cache:
+            json.dump(self.cache, cache, indent=2)
+        os.replace(self.cache_file + '.tmp', self.cache_file)
@@ -0,0 +1,181 @@
+'''
+Benchmark of the whole application over a fixed clip, for a matrix of devices x precisions x pipeline modes.
+
+Each configuration runs in its own process (so that the loading time and the peak memory are not shared),
+with the mouse moves recorded instead of sent to the system. For each configuration, it records :
+- the models loading time,
+- the end-to-end frames per second,
+- the latency histogram and p50 / p95 / p99 of each stage and of the total inferences,
+- the peak resident memory.
+All the results are written to a JSON file, which can be used later as the baseline of another run :
+the regressions (frames per second drop, p95 latency or loading time increase) beyond the tolerance are reported,
+and the exit code is then 1.
+
+The 'STUB' device runs stub networks with set latencies (see stub_backend.py), to exercise the benchmark itself
+on a machine without OpenVINO or without the models.
+
+Sample usage:
+    python benchmark.py --devices CPU,GPU --precisions FP32,FP16 --modes serial,async --output benchmark.json
+    python benchmark.py --devices CPU --baseline benchmark.json --tolerance 0.1
+    python benchmark.py --devices STUB --stub_latencies face_detection=0.02
+'''
+import argparse
+import json
+import subprocess
+import sys
+
+FACE_DETECTION_MODEL = "models/intel/face-detection-adas-binary-0001/FP32-INT1/face-detection-adas-binary-0001"
+MODEL_PATH = "models/intel/{name}/{precision}/{name}"
+MODELS = {
+    'gaze_estimation_model': 'gaze-estimation-adas-0002',
+    'head_pose_estimation_model': 'head-pose-estimation-adas-0001',
+    'facial_landmarks_detection_model': 'landmarks-regression-retail-0009'
+}
+
+# command line arguments of each pipeline mode
+MODES = {
+    'serial': [],
+    'async': ['--async_mode', 'True'],
+    'track': ['--track_face', 'True'],
+    'async_track': ['--async_mode', 'True', '--track_face', 'True']
+}
+
+# smaller differences of times (in seconds) are measurement noise, never regressions
+MIN_TIME_DIFFERENCE = 0.001
+
+# marks the line of the results in the output of a configuration process
+RESULT_PREFIX = 'BENCHMARK_RESULT '
+
+
+def configuration_key(configuration):
+    return "{device}/{precision}/{mode}".format(**configuration)
+
+
+def configuration_arguments(configuration):
+    '''
+    Return the command line arguments of main.py for a configuration.
+    '''
+    arguments = ['--device', configuration['device'], '--input_type', 'video',
+                 '--input_file', configuration['input_file'], '--frame_skip', str(configuration['frame_skip']),
+                 '--show_face', 'False', '--face_detection_model', FACE_DETECTION_MODEL]
+    # the face detection model is available only with a FP32-INT1 precision
+    for argument, name in MODELS.items():
+        arguments += ['--' + argument, MODEL_PATH.format(name=name, precision=configuration['precision'])]
+    if configuration['stub_latencies'] is not None:
+        arguments += ['--stub_latencies', configuration['stub_latencies']]
+    return arguments + MODES[configuration['mode']]
+
+
+def run_one(configuration):
+    '''
+    Run the application with a configuration (in this process) and print its results.
+    '''
+    from main import Computer_Pointer_Controller, build_parser
+    from mouse_controller import RecordingBackend
+    from run_stats import peak_rss_kb
+
+    args = build_parser().parse_args(configuration_arguments(configuration))
+    computer_pointer_controller = Computer_Pointer_Controller(args, mouse_backend=RecordingBackend())
+    stats = computer_pointer_controller.run()
+    stats['load_time'] = computer_pointer_controller.load_time
+    stats['peak_rss_kb'] = peak_rss_kb()
+    print(RESULT_PREFIX + json.dumps(stats))
+
+
+def run_configuration(configuration):
+    '''
+    Run a configuration in a new process, and return its results (or the error if it failed).
+    '''
+    process = subprocess.run([sys.executable, __file__, '--run_one', json.dumps(configuration)],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    return {'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else
+            "no result (exit code {})".format(process.returncode)}
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Return the list of the regressions of the results compared to the baseline, beyond the relative tolerance.
+    '''
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None or 'error' in reference or 'error' in result:
+            continue
+        if result['frames_per_second'] < reference['frames_per_second'] * (1 - tolerance):
+            regressions.append("{} : frames per second {:.1f} -> {:.1f}".format(
+                key, reference['frames_per_second'], result['frames_per_second']))
+        if reference['load_time'] is not None and result['load_time'] > max(reference['load_time'] * (1 + tolerance),
+                                                                          reference['load_time'] + MIN_TIME_DIFFERENCE):
+            regressions.append("{} : loading time {:.3f} s -> {:.3f} s".format(
+                key, reference['load_time'], result['load_time']))
+        summaries = [('end_to_end', result['end_to_end'], reference['end_to_end'])]
+        summaries += [(stage, summary, reference['stages'].get(stage)) for stage, summary in result['stages'].items()]
+        for name, summary, reference_summary in summaries:
+            if reference_summary is None or reference_summary['p95'] is None or summary['p95'] is None:
+                continue
+            if summary['p95'] > max(reference_summary['p95'] * (1 + tolerance),
+                                    reference_summary['p95'] + MIN_TIME_DIFFERENCE):
+                regressions.append("{} : {} p95 latency {:.2f} ms -> {:.2f} ms".format(
+                    key, name, reference_summary['p95'] * 1000, summary['p95'] * 1000))
+    return regressions
+
+
+def print_result(key, result):
+    if 'error' in result:
+        print("{:<30} failed : {}".format(key, result['error']))
+        return
+    end_to_end = result['end_to_end']
+    p95 = "{:.2f} ms".format(end_to_end['p95'] * 1000) if end_to_end['p95'] is not None else "-"
+    print("{:<30} load {:7.3f} s / {:6.1f} fps / p95 {} / peak RSS {} KB".format(
+        key, result['load_time'], result['frames_per_second'], p95, result['peak_rss_kb']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', default='CPU')
+    parser.add_argument('--precisions', default='FP32')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--input_file', default='resources/example.mp4')
+    parser.add_argument('--frame_skip', type=int, default=1)
+    parser.add_argument('--stub_latencies', default=None)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--run_one', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        run_one(json.loads(args.run_one))
+        sys.exit(0)
+
+    for mode in args.modes.split(','):
+        if mode not in MODES:
+            parser.error("unknown mode " + mode)
+    results = {}
+    for device in args.devices.split(','):
+        for precision in args.precisions.split(','):
+            for mode in args.modes.split(','):
+                configuration = {'device': device, 'precision': precision, 'mode': mode,
+                                 'input_file': args.input_file, 'frame_skip': args.frame_skip,
+                                 'stub_latencies': args.stub_latencies}
+                key = configuration_key(configuration)
+                results[key] = run_configuration(configuration)
+                results[key]['configuration'] = configuration
+                print_result(key, results[key])
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print("Results written to", args.output)
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("Regressions compared to", args.baseline, ":")
+            for regression in regressions:
+                print("   ", regression)
+            sys.exit(1)
+        print("No regression compared to", args.baseline)
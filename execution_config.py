@@ -0,0 +1,121 @@
+'''
+These are the execution settings of each model : device, number of inference threads, throughput streams,
+thread binding and number of infer requests.
+
+The settings of the four models ('face_detection', 'landmarks', 'head_pose' and 'gaze') are a dict of model -> settings,
+the None values leaving the plugin defaults. They can be :
+- read from a JSON file with the same structure, e.g. {"face_detection": {"threads": 6}, "gaze": {"threads": 1}},
+- sized from the number of CPU cores ('auto') : the face detection gets most of the cores, bound to them,
+  and the three small networks get a single unbound thread each, so they run on the remaining cores,
+- changed from the command line, e.g. "face_detection.threads=6,gaze.device=MYRIAD".
+
+The CPU plugin can not pin a network to a given list of cores : the thread binding ('YES' to pin the threads to cores,
+'NUMA' to the NUMA nodes, 'NO' to let the system schedule them) is the affinity setting.
+'''
+import json
+import os
+
+MODELS = ['face_detection', 'landmarks', 'head_pose', 'gaze']
+# setting -> type of its value
+SETTINGS = {'device': str, 'threads': int, 'streams': int, 'bind': str, 'num_requests': int}
+BIND_VALUES = ['YES', 'NO', 'NUMA']
+
+
+def default_settings(device='CPU', num_requests=1):
+    '''
+    Return the settings running the four models on the device with the plugin defaults,
+    the face detection having num_requests infer requests.
+    '''
+    settings = {model: {'device': device, 'threads': None, 'streams': None, 'bind': None, 'num_requests': 1}
+                for model in MODELS}
+    settings['face_detection']['num_requests'] = num_requests
+    return settings
+
+
+def auto_settings(device='CPU', num_requests=1, cpu_count=None):
+    '''
+    Return the settings sized from the number of CPU cores.
+    '''
+    settings = default_settings(device, num_requests)
+    if device != 'CPU':
+        return settings
+    cpu_count = cpu_count or os.cpu_count() or 1
+    # two cores are left to the small networks (the landmarks and head pose estimation run at the same time)
+    face_detection_threads = max(1, cpu_count - 2) if cpu_count > 2 else cpu_count
+    settings['face_detection'].update({
+        'threads': face_detection_threads,
+        # one stream per infer request, so that the frames in flight are processed in parallel
+        'streams': max(1, min(num_requests, face_detection_threads // 2)),
+        'bind': 'YES' if cpu_count > 2 else 'NO'
+    })
+    for model in MODELS[1:]:
+        settings[model].update({'threads': 1, 'streams': 1, 'bind': 'NO'})
+    return settings
+
+
+def load_settings(path, device='CPU', num_requests=1):
+    '''
+    Return the default settings updated from a JSON file.
+    '''
+    settings = default_settings(device, num_requests)
+    with open(path) as settings_file:
+        for model, values in json.load(settings_file).items():
+            for name, value in values.items():
+                set_value(settings, model, name, value)
+    return settings
+
+
+def set_value(settings, model, name, value):
+    '''
+    Change a setting of a model, checking its name and value.
+    '''
+    if model not in MODELS:
+        raise ValueError("Unknown model in the execution settings: " + model)
+    if name not in SETTINGS:
+        raise ValueError("Unknown execution setting: " + name)
+    value = SETTINGS[name](value) if value is not None else None
+    if name == 'bind' and value is not None and value not in BIND_VALUES:
+        raise ValueError("The bind setting must be one of " + ", ".join(BIND_VALUES))
+    settings[model][name] = value
+
+
+def apply_overrides(settings, text):
+    '''
+    Change the settings from a text like "face_detection.threads=6,gaze.device=MYRIAD".
+    '''
+    for item in text.split(','):
+        key, value = item.split('=')
+        model, name = key.strip().split('.')
+        set_value(settings, model, name, value.strip())
+    return settings
+
+
+def plugin_config(settings):
+    '''
+    Return the plugin config of the settings of a model.
+    '''
+    config = {}
+    if settings['device'] == 'CPU':
+        if settings['threads'] is not None:
+            config['CPU_THREADS_NUM'] = str(settings['threads'])
+        if settings['streams'] is not None:
+            config['CPU_THROUGHPUT_STREAMS'] = str(settings['streams'])
+        if settings['bind'] is not None:
+            config['CPU_BIND_THREAD'] = settings['bind']
+    elif settings['device'] == 'GPU' and settings['streams'] is not None:
+        config['GPU_THROUGHPUT_STREAMS'] = str(settings['streams'])
+    return config
+
+
+def print_layout(settings):
+    '''
+    Print the execution settings of each model.
+    '''
+    print("Execution layout :")
+    for model in MODELS:
+        model_settings = settings[model]
+        print("    {:<15} device {:<8} threads {:<8} streams {:<8} bind {:<8} requests {}".format(
+            model, model_settings['device'],
+            *[str(model_settings[name]) if model_settings[name] is not None else 'default'
+              for name in ('threads', 'streams', 'bind')],
+            model_settings['num_requests']))
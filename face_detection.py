@@ -1,9 +1,9 @@
 '''
 This is the class for the Face Detection Model.
 '''
-import cv2
-from openvino.inference_engine.ie_api import IECore, IENetwork
-import pprint
+import numpy as np
+import inference_core
+from preprocessing import Input_Buffer, crop, full_frame
 
 # default threshold
 THRESHOLD = 0.5
@@ -12,82 +12,201 @@ class Face_Detection:
     '''
     Class for the Face Detection Model.
     '''
-    def __init__(self, model_name, device='CPU', extensions=None, perf_counts="False"):
+    def __init__(self, model_name, device='CPU', extensions=None, perf_counters=None, nms_threshold=None):
         self.model_weights = model_name + '.bin'
         self.model_structure = model_name + '.xml'
         self.device = device
         self.extensions = extensions
+        # IoU threshold of the non maximum suppression of the faces found (None to disable it)
+        self.nms_threshold = nms_threshold
+        self.model = None
+        self.net = None
+        # aggregated performance counters (see perf_counters.py), None to disable them
+        self.perf_counters = perf_counters
+
+    def read_model(self):
+        '''
+        This method reads the model IR files
+        '''
         try:
-            self.model = IENetwork(self.model_structure, self.model_weights)
+            self.model = inference_core.read_network(self.model_structure, self.model_weights, self.device)
         except Exception as e:
             raise ValueError("Could not Initialise the network. Have you enterred the correct model path?")
         self.input_name = next(iter(self.model.inputs))
         self.input_shape = self.model.inputs[self.input_name].shape
         self.output_name = next(iter(self.model.outputs))
         self.output_shape = self.model.outputs[self.output_name].shape
-        self.net = None
-        self.pp = None
-        if perf_counts == "True":
-            self.pp = pprint.PrettyPrinter(indent=4)
+        self.input_buffer = Input_Buffer(self.input_shape)
+        # input size of the model, before any change of the input scale
+        self.original_input_shape = list(self.input_shape)
+        self.input_scale = 1.0
+
+    def reshape(self, batch_size):
+        '''
+        This method changes the number of images processed by each inference
+        '''
+        self.model.reshape({self.input_name: (batch_size, *self.input_shape[1:])})
+        self.input_shape = self.model.inputs[self.input_name].shape
+        self.output_shape = self.model.outputs[self.output_name].shape
+        self.input_buffer = Input_Buffer(self.input_shape)
+
+    def load_model(self, num_requests=1, batch_size=1, config=None):
+        '''
+        This method loads the model, with num_requests infer requests available for asynchronous inference,
+        each processing batch_size images at once, with the plugin config (threads, streams...)
+        '''
+        if self.model is None:
+            self.read_model()
+        if batch_size != self.input_shape[0]:
+            self.reshape(batch_size)
+        config = dict(config or {})
+        if self.perf_counters is not None:
+            config.update(self.perf_counters.config)
+        # kept to load the network again when its input scale changes
+        self.num_requests = num_requests
+        self.config = config or None
+        self.net = inference_core.load_network(self.model, self.model_structure, self.model_weights, self.device,
+                                               num_requests, self.extensions, self.config)
+
+    def set_input_scale(self, scale):
+        '''
+        This method reshapes the model input to scale times its original height and width (rounded to multiples
+        of 32 pixels) and loads it again. No inference must be running.
+        '''
+        batch_size, channels, height, width = self.original_input_shape
+        height = max(32, int(round(height * scale / 32)) * 32)
+        width = max(32, int(round(width * scale / 32)) * 32)
+        self.model.reshape({self.input_name: (self.input_shape[0], channels, height, width)})
+        self.input_shape = self.model.inputs[self.input_name].shape
+        self.output_shape = self.model.outputs[self.output_name].shape
+        self.input_buffer = Input_Buffer(self.input_shape)
+        self.input_scale = scale
+        self.net = inference_core.load_network(self.model, self.model_structure, self.model_weights, self.device,
+                                               self.num_requests, self.extensions, self.config)
+
+    def predict(self, image, mirror=False):
+        '''
+        Return the cropped face found in the provided (mirrored if mirror is set) image (None if no face is found)
+        '''
+        self.start_async(image, mirror=mirror)
+        return self.crop_face(image, self.wait(), mirror)
+
+    def start_async(self, image, request_id=0, mirror=False):
+        '''
+        Start an asynchronous inference on the provided (mirrored if mirror is set) image, using the infer request request_id
+        '''
+        self.net.start_async(request_id=request_id, inputs={self.input_name: self.preprocess_input(image, mirror)})
+
+    def wait(self, request_id=0):
+        '''
+        Wait for the infer request request_id to complete and return the coordinates of the faces found
+        '''
+        return self.preprocess_output(self.wait_request(request_id)[self.output_name])
+
+    def predict_batch(self, images, mirror=False):
+        '''
+        Return the coordinates of the faces found in each of the provided images (at most the batch size)
+        '''
+        for index, image in enumerate(images):
+            self.preprocess_input(image, mirror, index)
+        self.net.start_async(request_id=0, inputs={self.input_name: self.input_buffer.tensor})
+        outputs = self.wait_request()[self.output_name]
+        return [self.preprocess_output(outputs, index) for index in range(len(images))]
 
-    def load_model(self):
+    def crop_face(self, image, coords, mirror=False):
         '''
-        This method loads the model
+        Return the cropped face from the provided coordinates (None if no face is found)
         '''
-        core = IECore()
-        if self.extensions != None:
-            core.add_extension(self.extensions, self.device)
-        self.net = core.load_network(network=self.model, device_name=self.device, num_requests=1)
+        box = self.get_face_box(image, coords)
+        if box is None:
+            return None
+        return crop(image, box, mirror)
 
-    def predict(self, image):
+    def get_face_box(self, image, coords):
         '''
-        Return the cropped face found in the provided image (None if no face is found)
+        Return the box (x, y, w, h) in pixels of the face found from the provided coordinates (None if no face is found)
         '''
-        preprocessed_image = self.preprocess_input(image)
-        output = self.net.infer({self.input_name: preprocessed_image})
-        if self.pp is not None:
-            self.pp.pprint(self.net.requests[0].get_perf_counts())
-        coords = self.preprocess_output(output[self.output_name])
-        if not coords:
+        # here we consider only the first face found, the most confident one
+        boxes = self.get_face_boxes(image, coords[:1])
+        if not boxes:
             return None
-        else:
-            width = int(image.shape[1])
-            height = int(image.shape[0])
-            # here we consider only the first face found
-            x = int(coords[0][0] * width)
-            if x < 0:
-                x = 0
-            y = int(coords[0][1] * height)
-            if y < 0:
-                y = 0
-            w = int(coords[0][2] * width) - x
-            h = int(coords[0][3] * height) - y
-            # syntax reminder: getRectSubPix(InputArray image, Size patchSize, Point2f center)
-            return cv2.getRectSubPix(image, (w, h), (x + w / 2, y + h / 2))
+        return boxes[0]
+
+    def get_face_boxes(self, image, coords):
+        '''
+        Return the list of the boxes (x, y, w, h) in pixels of all the faces found from the provided coordinates
+        '''
+        width = int(image.shape[1])
+        height = int(image.shape[0])
+        pixels = (coords[:, :4] * (width, height, width, height)).astype(int)
+        pixels[:, 2:] -= pixels[:, :2]
+        # boxes too thin once in pixels are ignored
+        pixels = pixels[(pixels[:, 2] > 0) & (pixels[:, 3] > 0)]
+        return [tuple(int(value) for value in box) for box in pixels]
+
+    def wait_request(self, request_id=0):
+        '''
+        Wait for the infer request request_id to complete and return its outputs
+        '''
+        request = self.net.requests[request_id]
+        request.wait(-1)
+        if self.perf_counters is not None:
+            self.perf_counters.record('face_detection', request)
+        return request.outputs
+
+    def request_latency(self, request_id=0):
+        '''
+        Return the inference time (in seconds) of the last inference of the infer request request_id
+        '''
+        return self.net.requests[request_id].latency / 1000
 
     def check_model(self):
         raise NotImplementedError
 
-    def preprocess_input(self, image):
+    def preprocess_input(self, image, mirror=False, index=0):
         '''
         Before feeding the data into the model for inference, given an input image:
-        - Resize to width and height required for the model
-        - Transpose the final "channel" dimension to be first
-        - Reshape the image to add a "batch" of 1 at the start
+        - Warp the (mirrored if mirror is set) image to the width and height required for the model
+        - Write it with the "channel" dimension first in the preallocated input tensor, at the index in the batch
         '''
-        image = cv2.resize(image, (self.input_shape[3], self.input_shape[2]))
-        image = image.transpose((2, 0, 1))
-        image = image.reshape(1, *image.shape)
-        return image
+        return self.input_buffer.write(image, full_frame(image), mirror, index)
 
-    def preprocess_output(self, outputs):
+    def preprocess_output(self, outputs, image_id=0):
         '''
         Before feeding the output of this model to the next model,
         you might have to preprocess the output. This function is where you can do that.
+
+        Each bounding box is [image_id, label, conf, x_min, y_min, x_max, y_max], we keep those of image_id.
+        Return a numpy array of the faces found, one [x_min, y_min, x_max, y_max, conf] row per face,
+        with the coordinates clipped to [0, 1], by decreasing confidence.
         '''
-        coords = []
-        for bounding_box in outputs[0][0]:
-            conf = bounding_box[2]
-            if conf >= THRESHOLD:
-                coords.append([bounding_box[3], bounding_box[4], bounding_box[5], bounding_box[6]])
+        detections = outputs[0][0]
+        detections = detections[(detections[:, 0] == image_id) & (detections[:, 2] >= THRESHOLD)]
+        coords = np.empty((len(detections), 5), dtype=np.float32)
+        coords[:, :4] = np.clip(detections[:, 3:7], 0, 1)
+        coords[:, 4] = detections[:, 2]
+        coords = coords[np.argsort(-coords[:, 4], kind='stable')]
+        if self.nms_threshold is not None:
+            coords = coords[non_max_suppression(coords[:, :4], self.nms_threshold)]
         return coords
+
+
+def non_max_suppression(boxes, threshold):
+    '''
+    Return the indices of the boxes [x_min, y_min, x_max, y_max] to keep, the boxes being sorted by decreasing confidence :
+    a box is removed when its IoU with a more confident kept box is over the threshold.
+    '''
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.arange(len(boxes))
+    keep = []
+    while len(order) > 0:
+        best = order[0]
+        keep.append(best)
+        others = order[1:]
+        width = np.maximum(0, np.minimum(boxes[best, 2], boxes[others, 2]) - np.maximum(boxes[best, 0], boxes[others, 0]))
+        height = np.maximum(0, np.minimum(boxes[best, 3], boxes[others, 3]) - np.maximum(boxes[best, 1], boxes[others, 1]))
+        intersection = width * height
+        iou = intersection / np.maximum(areas[best] + areas[others] - intersection, 1e-9)
+        order = others[iou <= threshold]
+    return np.array(keep, dtype=int)
+
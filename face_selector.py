@@ -0,0 +1,64 @@
+'''
+This class chooses which of the faces found in a frame drives the mouse pointer.
+
+The available policies are :
+- 'first' : the most confident face,
+- 'largest' : the face with the largest box,
+- 'central' : the face closest to the center of the frame,
+- 'sticky' : the face overlapping the most the one selected on the previous frame, so that the pointer stays
+  with the same person while other people come and go. When the previous face is lost, the largest face is taken.
+'''
+import numpy as np
+
+POLICIES = ['first', 'largest', 'central', 'sticky']
+# minimal IoU with the previous face for the sticky policy to consider it is the same person
+STICKY_IOU = 0.3
+
+
+def iou(box, boxes):
+    '''
+    Return the IoU of the box (x, y, w, h) with each of the boxes.
+    '''
+    boxes = np.asarray(boxes, dtype=np.float32)
+    width = np.maximum(0, np.minimum(box[0] + box[2], boxes[:, 0] + boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]))
+    height = np.maximum(0, np.minimum(box[1] + box[3], boxes[:, 1] + boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]))
+    intersection = width * height
+    return intersection / np.maximum(box[2] * box[3] + boxes[:, 2] * boxes[:, 3] - intersection, 1e-9)
+
+
+class Face_Selector:
+    def __init__(self, policy='first', sticky_iou=STICKY_IOU):
+        if policy not in POLICIES:
+            raise ValueError("Unknown face selection policy: " + policy)
+        self.policy = policy
+        self.sticky_iou = sticky_iou
+        self.previous_box = None
+        # number of times the sticky policy lost the previous face
+        self.switches = 0
+
+    def select(self, boxes, frame_shape):
+        '''
+        Return the index of the selected box (x, y, w, h) among the boxes found in a frame of the provided shape,
+        or None if there is no box.
+        '''
+        if not boxes:
+            self.previous_box = None
+            return None
+        selected = 0
+        array = np.asarray(boxes, dtype=np.float32)
+        if self.policy == 'largest':
+            selected = int(np.argmax(array[:, 2] * array[:, 3]))
+        elif self.policy == 'central':
+            centers = array[:, :2] + array[:, 2:] / 2
+            distances = np.hypot(centers[:, 0] - frame_shape[1] / 2, centers[:, 1] - frame_shape[0] / 2)
+            selected = int(np.argmin(distances))
+        elif self.policy == 'sticky':
+            overlaps = iou(self.previous_box, array) if self.previous_box is not None else None
+            if overlaps is not None and overlaps.max() >= self.sticky_iou:
+                selected = int(np.argmax(overlaps))
+            else:
+                if self.previous_box is not None:
+                    self.switches += 1
+                selected = int(np.argmax(array[:, 2] * array[:, 3]))
+        self.previous_box = boxes[selected]
+        return selected
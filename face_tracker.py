@@ -0,0 +1,146 @@
+'''
+This class tracks the face region of interest (ROI) between frames, so that the full frame face detection
+does not have to run on every frame.
+
+After a face detection, the ROI is carried forward and updated on each frame from the facial landmarks
+found in it : the ROI follows the landmarks centroid and is scaled with the distance between the eyes.
+The face detection runs again :
+- every redetect_interval frames (counted from the frame where the last face detection was scheduled, so that
+  the frames submitted while it runs in an asynchronous pipeline do not schedule other ones),
+- when the landmarks are not sane (outside of the ROI, eyes too close or too far from each other),
+- when the ROI drifted from the last detected face by more than max_drift times the face width.
+'''
+import numpy as np
+
+# by default, a full frame face detection runs at least every 10 frames
+REDETECT_INTERVAL = 10
+MAX_DRIFT = 0.5
+# sane distance between the eyes, as a ratio of the ROI width
+MIN_EYES_DISTANCE = 0.15
+MAX_EYES_DISTANCE = 0.75
+
+
+class Face_Tracker:
+    def __init__(self, redetect_interval=REDETECT_INTERVAL, max_drift=MAX_DRIFT,
+                 min_eyes_distance=MIN_EYES_DISTANCE, max_eyes_distance=MAX_EYES_DISTANCE):
+        self.redetect_interval = redetect_interval
+        self.max_drift = max_drift
+        self.min_eyes_distance = min_eyes_distance
+        self.max_eyes_distance = max_eyes_distance
+        # current ROI (x, y, w, h) and the last detected one
+        self.roi = None
+        self.detected_roi = None
+        # position of the landmarks centroid in the ROI and eyes distance, relative to the ROI size, at detection time
+        self.reference = None
+        # frames submitted since the last face detection was scheduled (that frame included)
+        self.frames_since_detection = 0
+        # face detections scheduled whose face was not set yet
+        self.pending_detections = 0
+        self.detection_requested = True
+        # statistics
+        self.frames = 0
+        self.detections = 0
+        self.tracked_frames = 0
+        self.interval_detections = 0
+        self.misses = 0
+        self.drifts = 0
+
+    def needs_detection(self):
+        '''
+        Return True if the face detection must run on the next frame. Called once per frame.
+        '''
+        self.frames += 1
+        if self.pending_detections == 0:
+            if self.detection_requested or self.roi is None:
+                return self.schedule_detection()
+            if self.frames_since_detection >= self.redetect_interval:
+                self.interval_detections += 1
+                return self.schedule_detection()
+        # while a face detection is pending, the frame is tracked from its result
+        self.frames_since_detection += 1
+        return False
+
+    def schedule_detection(self):
+        self.pending_detections += 1
+        self.frames_since_detection = 1
+        return True
+
+    def can_track(self):
+        '''
+        Return True if there is a ROI to track and no face detection was requested since.
+        '''
+        return self.roi is not None and not self.detection_requested
+
+    def set_detection(self, box):
+        '''
+        Start tracking from a face box found by the face detection (None if no face was found).
+        '''
+        self.detections += 1
+        self.roi = box
+        self.detected_roi = box
+        self.reference = None
+        if self.pending_detections > 0:
+            # the interval started when this face detection was scheduled
+            self.pending_detections -= 1
+        else:
+            self.frames_since_detection = 1
+        self.detection_requested = box is None
+
+    def tracked_roi(self):
+        '''
+        Return the ROI to use on the current frame without face detection.
+        '''
+        self.tracked_frames += 1
+        return self.roi
+
+    def update(self, box, landmarks):
+        '''
+        Update the ROI from the landmarks (in pixels in the face cropped with box) found on the current frame.
+        Return False if the landmarks are not sane, in which case the face detection must run again.
+        '''
+        x, y, w, h = box
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        eyes_distance = float(np.linalg.norm(landmarks[1] - landmarks[0])) / w
+        inside = np.all((landmarks >= 0) & (landmarks <= (w, h)))
+        if not inside or not self.min_eyes_distance <= eyes_distance <= self.max_eyes_distance:
+            if self.reference is not None:
+                # the tracking was lost (and not the detection wrong)
+                self.misses += 1
+            self.detection_requested = True
+            return False
+        centroid = landmarks.mean(axis=0)
+        if self.reference is None:
+            # first landmarks after a detection : remember where they are in the detected face
+            self.reference = (centroid[0] / w, centroid[1] / h, eyes_distance)
+            return True
+        # move and scale the ROI so that the landmarks are at the same place as in the detected face
+        new_w = w * eyes_distance / self.reference[2]
+        new_h = new_w * self.detected_roi[3] / self.detected_roi[2]
+        new_x = x + centroid[0] - self.reference[0] * new_w
+        new_y = y + centroid[1] - self.reference[1] * new_h
+        self.roi = (max(0, int(new_x)), max(0, int(new_y)), max(1, int(new_w)), max(1, int(new_h)))
+        detected_x, detected_y, detected_w, detected_h = self.detected_roi
+        drift = np.hypot(new_x + new_w / 2 - detected_x - detected_w / 2,
+                         new_y + new_h / 2 - detected_y - detected_h / 2) / detected_w
+        if drift > self.max_drift:
+            self.drifts += 1
+            self.detection_requested = True
+        return True
+
+    def stats(self):
+        '''
+        Return the tracking statistics as a dict.
+        '''
+        return {
+            'redetect_interval': self.redetect_interval,
+            'frames': self.frames,
+            'detections': self.detections,
+            'tracked_frames': self.tracked_frames,
+            'interval_detections': self.interval_detections,
+            'misses': self.misses,
+            'drifts': self.drifts,
+            # ratio of the tracked frames where the tracking held
+            'hit_rate': (self.tracked_frames - self.misses) / self.tracked_frames if self.tracked_frames else 0.0,
+            # ratio of the frames where the face detection ran
+            'detection_rate': self.detections / self.frames if self.frames else 0.0
+        }
@@ -1,72 +1,134 @@
 '''
 This is the class for the Gaze Estimation Model.
 '''
-import cv2
-from openvino.inference_engine.ie_api import IENetwork, IECore
-import pprint
+import numpy as np
+import inference_core
+from preprocessing import Input_Buffer
 
 
 class Gaze_Estimation:
     '''
     Class for the Gaze Estimation Model.
     '''
-    def __init__(self, model_name, device='CPU', extensions=None, perf_counts="False"):
+    def __init__(self, model_name, device='CPU', extensions=None, perf_counters=None):
         self.model_weights = model_name + '.bin'
         self.model_structure = model_name + '.xml'
         self.device = device
         self.extensions = extensions
+        self.model = None
+        self.net = None
+        # aggregated performance counters (see perf_counters.py), None to disable them
+        self.perf_counters = perf_counters
+
+    def read_model(self):
+        '''
+        This method reads the model IR files
+        '''
         try:
-            self.model = IENetwork(self.model_structure, self.model_weights)
+            self.model = inference_core.read_network(self.model_structure, self.model_weights, self.device)
         except Exception as e:
             raise ValueError("Could not Initialise the network. Have you enterred the correct model path?")
         self.input_shape = self.model.inputs['left_eye_image'].shape # same shape for both eyes
         self.output_name = next(iter(self.model.outputs))
         self.output_shape = self.model.outputs[self.output_name].shape
-        self.net = None
-        self.pp = None
-        if perf_counts == "True":
-            self.pp = pprint.PrettyPrinter(indent=4)
+        self.left_eye_buffer = Input_Buffer(self.input_shape)
+        self.right_eye_buffer = Input_Buffer(self.input_shape)
+        self.head_pose_angles = np.zeros(self.model.inputs['head_pose_angles'].shape, dtype=np.float32)
 
-    def load_model(self):
+    def reshape(self, batch_size):
         '''
-        This method loads the model
+        This method changes the number of eyes pairs processed by each inference
         '''
-        core = IECore()
-        if self.extensions != None:
-            core.add_extension(self.extensions, self.device)
-        self.net = core.load_network(network=self.model, device_name=self.device, num_requests=1)
+        self.model.reshape({
+            'left_eye_image': (batch_size, *self.input_shape[1:]),
+            'right_eye_image': (batch_size, *self.input_shape[1:]),
+            'head_pose_angles': (batch_size, 3)
+        })
+        self.input_shape = self.model.inputs['left_eye_image'].shape
+        self.output_shape = self.model.outputs[self.output_name].shape
+        self.left_eye_buffer = Input_Buffer(self.input_shape)
+        self.right_eye_buffer = Input_Buffer(self.input_shape)
+        self.head_pose_angles = np.zeros((batch_size, 3), dtype=np.float32)
 
-    def predict(self, left_eye_image, right_eye_image, head_pose_angles):
+    def load_model(self, num_requests=1, batch_size=1, config=None):
+        '''
+        This method loads the model, with num_requests infer requests available for asynchronous inference,
+        each processing batch_size images at once, with the plugin config (threads, streams...)
+        '''
+        if self.model is None:
+            self.read_model()
+        if batch_size != self.input_shape[0]:
+            self.reshape(batch_size)
+        config = dict(config or {})
+        if self.perf_counters is not None:
+            config.update(self.perf_counters.config)
+        self.net = inference_core.load_network(self.model, self.model_structure, self.model_weights, self.device,
+                                               num_requests, self.extensions, config or None)
+
+    def predict(self, image, left_eye_box, right_eye_box, head_pose_angles, mirror=False):
         '''
         This method is meant for running predictions with the provided inputs :
-        square crop of left eye image, square crop of right eye image, and three head pose angles – (yaw, pitch, and roll)
+        boxes of left eye and right eye in the input image, and three head pose angles – (yaw, pitch, and roll)
+        '''
+        self.start_async(image, left_eye_box, right_eye_box, head_pose_angles, mirror=mirror)
+        return self.wait()
+
+    def start_async(self, image, left_eye_box, right_eye_box, head_pose_angles, request_id=0, mirror=False):
+        '''
+        Start an asynchronous inference with the provided inputs, using the infer request request_id
 
         Names of the inputs & output are those provided in the model's documentation :
         https://docs.openvinotoolkit.org/latest/_models_intel_gaze_estimation_adas_0002_description_gaze_estimation_adas_0002.html
         '''
-        output = self.net.infer({
-                        'left_eye_image': self.preprocess_input(left_eye_image),
-                        'right_eye_image': self.preprocess_input(right_eye_image),
+        self.net.start_async(request_id=request_id, inputs={
+                        'left_eye_image': self.preprocess_input(image, left_eye_box, self.left_eye_buffer, mirror),
+                        'right_eye_image': self.preprocess_input(image, right_eye_box, self.right_eye_buffer, mirror),
                         'head_pose_angles': head_pose_angles
                       })
-        if self.pp is not None:
-            self.pp.pprint(self.net.requests[0].get_perf_counts())
-        return output['gaze_vector'][0]
+
+    def wait(self, request_id=0):
+        '''
+        Wait for the infer request request_id to complete and return the gaze vector
+        '''
+        # the output blob is reused by the next inference on this request, so keep a copy
+        return self.wait_request(request_id)['gaze_vector'][0].copy()
+
+    def wait_request(self, request_id=0):
+        '''
+        Wait for the infer request request_id to complete and return its outputs
+        '''
+        request = self.net.requests[request_id]
+        request.wait(-1)
+        if self.perf_counters is not None:
+            self.perf_counters.record('gaze', request)
+        return request.outputs
+
+    def predict_batch(self, images, left_eye_boxes, right_eye_boxes, head_pose_angles, mirror=False):
+        '''
+        Run the predictions on several eyes pairs (at most the batch size) with their head pose angles,
+        and return a numpy array of the gaze vector of each pair
+        '''
+        for index, (image, left_eye_box, right_eye_box) in enumerate(zip(images, left_eye_boxes, right_eye_boxes)):
+            self.preprocess_input(image, left_eye_box, self.left_eye_buffer, mirror, index)
+            self.preprocess_input(image, right_eye_box, self.right_eye_buffer, mirror, index)
+        self.head_pose_angles[:len(head_pose_angles)] = head_pose_angles
+        self.net.start_async(request_id=0, inputs={
+                        'left_eye_image': self.left_eye_buffer.tensor,
+                        'right_eye_image': self.right_eye_buffer.tensor,
+                        'head_pose_angles': self.head_pose_angles
+                      })
+        return self.wait_request()['gaze_vector'][:len(head_pose_angles)].copy()
 
     def check_model(self):
         raise NotImplementedError
 
-    def preprocess_input(self, image):
+    def preprocess_input(self, image, box, input_buffer, mirror=False, index=0):
         '''
-        Before feeding the data into the model for inference, given an input image:
-        - Resize to width and height required for the model
-        - Transpose the final "channel" dimension to be first
-        - Reshape the image to add a "batch" of 1 at the start
+        Before feeding the data into the model for inference, given an input image and the box of an eye:
+        - Warp the eye of the (mirrored if mirror is set) image to the width and height required for the model
+        - Write it with the "channel" dimension first in the preallocated input tensor, at the index in the batch
         '''
-        image = cv2.resize(image, (self.input_shape[3], self.input_shape[2]))
-        image = image.transpose((2, 0, 1))
-        image = image.reshape(1, *image.shape)
-        return image
+        return input_buffer.write(image, box, mirror, index)
 
     def preprocess_output(self, outputs):
         '''
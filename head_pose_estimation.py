@@ -1,71 +1,117 @@
 '''
 This is the class for the Head Pose Estimation Model.
 '''
-import cv2
 import numpy as np
-from openvino.inference_engine.ie_api import IENetwork, IECore
-import pprint
+import inference_core
+from preprocessing import Input_Buffer
 
 class Head_Pose_Estimation:
     '''
     Class for the Head Pose Estimation Model.
     '''
-    def __init__(self, model_name, device='CPU', extensions=None, perf_counts="False"):
+    def __init__(self, model_name, device='CPU', extensions=None, perf_counters=None):
         self.model_weights = model_name + '.bin'
         self.model_structure = model_name + '.xml'
         self.device = device
         self.extensions = extensions
+        self.model = None
+        self.net = None
+        # aggregated performance counters (see perf_counters.py), None to disable them
+        self.perf_counters = perf_counters
+
+    def read_model(self):
+        '''
+        This method reads the model IR files
+        '''
         try:
-            self.model = IENetwork(self.model_structure, self.model_weights)
+            self.model = inference_core.read_network(self.model_structure, self.model_weights, self.device)
         except Exception as e:
             raise ValueError("Could not Initialise the network. Have you enterred the correct model path?")
         self.input_name = next(iter(self.model.inputs))
         self.input_shape = self.model.inputs[self.input_name].shape
         self.output_name = next(iter(self.model.outputs))
         self.output_shape = self.model.outputs[self.output_name].shape
-        self.net = None
-        self.pp = None
-        if perf_counts == "True":
-            self.pp = pprint.PrettyPrinter(indent=4)
+        self.input_buffer = Input_Buffer(self.input_shape)
+
+    def reshape(self, batch_size):
+        '''
+        This method changes the number of images processed by each inference
+        '''
+        self.model.reshape({self.input_name: (batch_size, *self.input_shape[1:])})
+        self.input_shape = self.model.inputs[self.input_name].shape
+        self.output_shape = self.model.outputs[self.output_name].shape
+        self.input_buffer = Input_Buffer(self.input_shape)
 
-    def load_model(self):
+    def load_model(self, num_requests=1, batch_size=1, config=None):
         '''
-        This method loads the model
+        This method loads the model, with num_requests infer requests available for asynchronous inference,
+        each processing batch_size images at once, with the plugin config (threads, streams...)
         '''
-        core = IECore()
-        if self.extensions != None:
-            core.add_extension(self.extensions, self.device)
-        self.net = core.load_network(network=self.model, device_name=self.device, num_requests=1)
+        if self.model is None:
+            self.read_model()
+        if batch_size != self.input_shape[0]:
+            self.reshape(batch_size)
+        config = dict(config or {})
+        if self.perf_counters is not None:
+            config.update(self.perf_counters.config)
+        self.net = inference_core.load_network(self.model, self.model_structure, self.model_weights, self.device,
+                                               num_requests, self.extensions, config or None)
 
-    def predict(self, image):
+    def predict(self, image, box, mirror=False):
         '''
-        This method is meant for running predictions on the input image of a face.
+        This method is meant for running predictions on the face inside the box (x, y, w, h) of the input image.
         Return a numpy array of the detected three head pose angles (yaw, pitch, and roll)
         '''
-        preprocessed_image = self.preprocess_input(image)
-        outputs = self.net.infer({self.input_name: preprocessed_image})
-        if self.pp is not None:
-            self.pp.pprint(self.net.requests[0].get_perf_counts())
-        return self.preprocess_output(outputs)
+        self.start_async(image, box, mirror=mirror)
+        return self.wait()
+
+    def start_async(self, image, box, request_id=0, mirror=False):
+        '''
+        Start an asynchronous inference on the face inside the box of the provided (mirrored if mirror is set) image,
+        using the infer request request_id
+        '''
+        self.net.start_async(request_id=request_id, inputs={self.input_name: self.preprocess_input(image, box, mirror)})
+
+    def wait(self, request_id=0):
+        '''
+        Wait for the infer request request_id to complete and return the three head pose angles
+        '''
+        return self.preprocess_output(self.wait_request(request_id))
+
+    def wait_request(self, request_id=0):
+        '''
+        Wait for the infer request request_id to complete and return its outputs
+        '''
+        request = self.net.requests[request_id]
+        request.wait(-1)
+        if self.perf_counters is not None:
+            self.perf_counters.record('head_pose', request)
+        return request.outputs
+
+    def predict_batch(self, images, boxes, mirror=False):
+        '''
+        Run the predictions on the faces inside the boxes of the images (at most the batch size),
+        and return a numpy array of the three head pose angles for each face
+        '''
+        for index, (image, box) in enumerate(zip(images, boxes)):
+            self.preprocess_input(image, box, mirror, index)
+        self.net.start_async(request_id=0, inputs={self.input_name: self.input_buffer.tensor})
+        return self.preprocess_output(self.wait_request(), len(boxes))
 
     def check_model(self):
         raise NotImplementedError
 
-    def preprocess_input(self, image):
+    def preprocess_input(self, image, box, mirror=False, index=0):
         '''
-        Before feeding the data into the model for inference, given an input image:
-        - Resize to width and height required for the model
-        - Transpose the final "channel" dimension to be first
-        - Reshape the image to add a "batch" of 1 at the start
+        Before feeding the data into the model for inference, given an input image and the box of the face:
+        - Warp the face of the (mirrored if mirror is set) image to the width and height required for the model
+        - Write it with the "channel" dimension first in the preallocated input tensor, at the index in the batch
         '''
-        image = cv2.resize(image, (self.input_shape[3], self.input_shape[2]))
-        image = image.transpose((2, 0, 1))
-        image = image.reshape(1, *image.shape)
-        return image
+        return self.input_buffer.write(image, box, mirror, index)
 
-    def preprocess_output(self, outputs):
+    def preprocess_output(self, outputs, count=1):
         '''
-        Return a numpy array of the detected three head pose angles (yaw, pitch, and roll)
+        Return a numpy array of the detected three head pose angles (yaw, pitch, and roll) for the count first faces of the batch
 
         Outputs contains :
         # name: "angle_y_fc", shape: [1, 1] - Estimated yaw (in degrees).
@@ -74,4 +120,4 @@ class Head_Pose_Estimation:
 
         More information at https://docs.openvinotoolkit.org/latest/_models_intel_head_pose_estimation_adas_0001_description_head_pose_estimation_adas_0001.html
         '''
-        return np.array([[outputs["angle_y_fc"][0][0],  outputs["angle_p_fc"][0][0], outputs["angle_r_fc"][0][0]]])
+        return np.stack([outputs["angle_y_fc"][:count, 0], outputs["angle_p_fc"][:count, 0], outputs["angle_r_fc"][:count, 0]], axis=1)
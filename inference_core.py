@@ -0,0 +1,168 @@
+'''
+This is the OpenVINO inference engine core shared by the four models, with an on-disk cache of compiled networks.
+
+A single IECore is created for the whole process. When a cache directory is set, each compiled network is
+exported to a blob whose name is a hash of :
+- the model xml and bin contents,
+- the device, the model precision, the input shapes (the network may have been reshaped), the extensions and the plugin config.
+On the next launches, the blob is imported instead of compiling the network again (warm start).
+Plugins unable to export their networks (like the CPU plugin of older OpenVINO releases) are asked to use
+their own model cache (CACHE_DIR config) when they support it.
+
+OpenVINO is only imported when the core is first needed, so that it can happen while other startup work runs.
+
+With the 'STUB' device, the networks are stubs with set latencies (see stub_backend.py) and OpenVINO is not used.
+'''
+import hashlib
+import json
+import os
+import threading
+import time
+
+import stub_backend
+from startup_timeline import timeline
+
+BLOB_EXTENSION = '.blob'
+STUB_DEVICE = 'STUB'
+
+_core = None
+_lock = threading.Lock()
+_extensions = set()
+_plugin_cache_devices = set()
+cache_dir = None
+# one entry per loaded network : (model_structure, device, status, loading time)
+load_reports = []
+
+
+def get_core():
+    '''
+    Return the IECore shared by the whole process.
+    '''
+    global _core
+    with _lock:
+        if _core is None:
+            with timeline.phase('import openvino'):
+                from openvino.inference_engine.ie_api import IECore
+            _core = IECore()
+        return _core
+
+
+def set_cache_dir(path):
+    '''
+    Enable the compiled networks cache in the provided directory (None to disable it).
+    '''
+    global cache_dir
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+    cache_dir = path
+
+
+def add_extension(extensions, device):
+    '''
+    Add the extensions library to the core, only once per device.
+    '''
+    if extensions is None:
+        return
+    core = get_core()
+    with _lock:
+        if (extensions, device) not in _extensions:
+            core.add_extension(extensions, device)
+            _extensions.add((extensions, device))
+
+
+def read_network(model_structure, model_weights, device=None):
+    '''
+    Read the IR files of a model, to be loaded on the device.
+    '''
+    if device == STUB_DEVICE:
+        return stub_backend.Stub_Network(model_structure)
+    core = get_core()
+    if hasattr(core, 'read_network'):
+        return core.read_network(model=model_structure, weights=model_weights)
+    from openvino.inference_engine.ie_api import IENetwork
+    return IENetwork(model_structure, model_weights)
+
+
+def file_digest(path, digest):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+
+def cache_key(model_structure, model_weights, device, extensions=None, config=None, input_shapes=None):
+    '''
+    Return the key of a compiled network in the cache.
+    '''
+    digest = hashlib.sha256()
+    file_digest(model_structure, digest)
+    file_digest(model_weights, digest)
+    # models are stored in a directory named after their precision (FP32, FP16, ...)
+    precision = os.path.basename(os.path.dirname(os.path.abspath(model_structure)))
+    digest.update(json.dumps([device, precision, extensions, config or {}, input_shapes or {}], sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def enable_plugin_cache(core, device):
+    '''
+    Ask the plugin to use its own model cache, if the OpenVINO release supports it.
+    '''
+    if device in _plugin_cache_devices:
+        return True
+    try:
+        core.set_config({'CACHE_DIR': cache_dir}, device)
+    except Exception:
+        return False
+    _plugin_cache_devices.add(device)
+    return True
+
+
+def load_network(network, model_structure, model_weights, device, num_requests=1, extensions=None, config=None):
+    '''
+    Return the network compiled for the device, imported from the cache when possible.
+    '''
+    start_time = time.time()
+    if device == STUB_DEVICE:
+        exec_net = stub_backend.Stub_Executable_Network(network, num_requests)
+        load_reports.append((model_structure, device, 'stub', time.time() - start_time))
+        return exec_net
+    core = get_core()
+    add_extension(extensions, device)
+    if cache_dir is None:
+        exec_net = core.load_network(network=network, device_name=device, config=config, num_requests=num_requests)
+        load_reports.append((model_structure, device, 'compiled', time.time() - start_time))
+        return exec_net
+
+    input_shapes = {name: list(info.shape) for name, info in network.inputs.items()}
+    key = cache_key(model_structure, model_weights, device, extensions, config, input_shapes)
+    blob = os.path.join(cache_dir, key + BLOB_EXTENSION)
+    if os.path.exists(blob):
+        try:
+            exec_net = core.import_network(model_file=blob, device_name=device, config=config, num_requests=num_requests)
+            load_reports.append((model_structure, device, 'imported', time.time() - start_time))
+            return exec_net
+        except Exception:
+            # corrupted blob or another OpenVINO release : compile it again
+            os.remove(blob)
+
+    plugin_cache = enable_plugin_cache(core, device)
+    exec_net = core.load_network(network=network, device_name=device, config=config, num_requests=num_requests)
+    status = 'compiled'
+    try:
+        # write to a temporary file first, so that a concurrent launch never reads a partial blob
+        exec_net.export(blob + '.tmp')
+        os.replace(blob + '.tmp', blob)
+        status = 'compiled and exported'
+    except Exception:
+        if os.path.exists(blob + '.tmp'):
+            os.remove(blob + '.tmp')
+        if plugin_cache:
+            status = 'compiled (plugin cache)'
+    load_reports.append((model_structure, device, status, time.time() - start_time))
+    return exec_net
+
+
+def warm_start_count():
+    '''
+    Return the number of networks imported from the cache, and the total number of networks loaded.
+    '''
+    return sum(1 for report in load_reports if report[2] == 'imported'), len(load_reports)
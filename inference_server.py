@@ -0,0 +1,436 @@
+'''
+This is the local inference server, loading the four models once for several clients (one per camera), and its client.
+
+The clients connect to a Unix domain socket and exchange newline-delimited JSON messages with the server. The frames
+themselves are not sent through the socket : each client creates a shared memory block of slots frames, writes each
+frame to a free slot and only sends the slot number. The server reads the frames in place.
+- client -> server : {"shm": name, "slots": 2, "shape": [480, 640, 3], "dtype": "uint8"} once, then {"id": 0, "slot": 1}
+- server -> client : {"id": 0, "face_box": [...], "landmarks": [...], "left_eye_box": [...], "right_eye_box": [...],
+  "head_pose_angles": [...], "gaze_vector": [...], "stage_times": {...}, "latency": 0.012, "batch_size": 3}
+  (null for the outputs which were not found)
+
+The requests of all the clients go to a single queue. The batching thread takes the first request, waits at most
+batch_window seconds for more (up to max_batch), then runs each stage once for the whole batch, as the offline mode does
+(see offline.py). The networks are loaded once for each batch size of batch_sizes(max_batch) (1, 2, 4... max_batch),
+and a batch runs on the smallest one it fits in : a lone client does not pay for the inference of a full batch.
+The requests are answered in their order, so each client gets its replies in the order of its frames.
+The latency (from the request to the reply) and the queue depth (requests waiting or being processed) are measured
+for each client, and displayed when the client disconnects.
+
+With Remote_Pipeline, main.py runs the models on the server instead of loading them (see --server_socket).
+
+Sample usage:
+    # the four models loaded with each batch size of batch_sizes(8)
+    server = Inference_Server({1: models_1, 2: models_2, 4: models_4, 8: models_8}, '/tmp/pointer_controller.sock')
+    server.serve()
+
+    client = Inference_Client('/tmp/pointer_controller.sock')
+    request_id, replies = client.submit(frame)
+    replies += client.flush()
+    client.close()
+'''
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from offline import Offline_Processor
+from pipeline import Frame_Result
+from run_stats import format_summary, latency_summary
+
+MAX_BATCH = 8
+BATCH_WINDOW = 0.005
+SLOTS = 2
+# outputs of a frame sent back to the client
+OUTPUTS = ['face_box', 'landmarks', 'left_eye_box', 'right_eye_box', 'head_pose_angles', 'gaze_vector']
+
+
+def batch_sizes(max_batch=MAX_BATCH):
+    '''
+    Return the batch sizes the models are loaded with : the powers of two below max_batch, and max_batch.
+    '''
+    sizes = []
+    size = 1
+    while size < max_batch:
+        sizes.append(size)
+        size *= 2
+    return sizes + [max_batch]
+
+
+def to_list(value):
+    return None if value is None else np.asarray(value, dtype=np.float64).tolist()
+
+
+def send_message(connection, message):
+    connection.sendall(json.dumps(message).encode() + b'\n')
+
+
+class Client_Connection:
+    '''
+    A client connected to the server, with the view of its frames in shared memory and its statistics.
+    '''
+    def __init__(self, client_id, connection, hello):
+        self.client_id = client_id
+        self.connection = connection
+        self.shared_memory = shared_memory.SharedMemory(name=hello['shm'])
+        # the shared memory belongs to the client : it must not be removed when the server exits
+        resource_tracker.unregister(self.shared_memory._name, 'shared_memory')
+        self.frames = np.ndarray((hello['slots'],) + tuple(hello['shape']), dtype=np.dtype(hello['dtype']),
+                                 buffer=self.shared_memory.buf)
+        self.send_lock = threading.Lock()
+        # statistics
+        self.requests = 0
+        self.pending = 0
+        self.max_pending = 0
+        self.latencies = []
+
+    def reply(self, request_id, result, times, latency, batch_size):
+        message = {name: to_list(getattr(result, name)) for name in OUTPUTS}
+        message.update({'id': request_id, 'latency': latency, 'batch_size': batch_size,
+                        'stage_times': {stage[:-len('_time')]: stage_time for stage, stage_time in times.items()}})
+        try:
+            with self.send_lock:
+                send_message(self.connection, message)
+        except OSError:
+            # the client is gone, its connection thread cleans up
+            pass
+
+    def stats(self):
+        '''
+        Return the statistics of the client as a dict.
+        '''
+        return {'client': self.client_id, 'requests': self.requests, 'queue_depth': self.pending,
+                'max_queue_depth': self.max_pending, 'latency': latency_summary(self.latencies)}
+
+    def close(self):
+        # the view must be released before the shared memory
+        self.frames = None
+        self.shared_memory.close()
+        self.connection.close()
+
+
+class Inference_Server:
+    '''
+    models maps each batch size to the four models (face detection, facial landmarks detection, head pose estimation,
+    gaze estimation) loaded with this batch size. The largest one is the maximum number of requests per batch.
+    '''
+    def __init__(self, models, socket_path, batch_window=BATCH_WINDOW, mirror=True):
+        self.processors = {batch_size: Offline_Processor(*stages, batch_size, mirror)
+                           for batch_size, stages in models.items()}
+        self.socket_path = socket_path
+        self.max_batch = max(models)
+        self.batch_window = batch_window
+        # requests of all the clients : (client, request id, slot, receive time)
+        self.requests = deque()
+        self.condition = threading.Condition()
+        self.clients = {}
+        self.next_client_id = 0
+        self.running = False
+        self.listener = None
+        # number of requests, and batch size of the models used, of each batch
+        self.batch_sizes = []
+        self.models_batch_sizes = []
+
+    def serve(self):
+        '''
+        Accept the clients and process their requests until stop is called (or Ctrl+C).
+        '''
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        self.listener.listen()
+        self.running = True
+        threading.Thread(target=self.accept, daemon=True).start()
+        print("Inference server listening on", self.socket_path)
+        try:
+            while True:
+                batch = self.next_batch()
+                if batch is None:
+                    break
+                self.process(batch)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def accept(self):
+        while self.running:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                # the listener was closed
+                break
+            threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def handle(self, connection):
+        '''
+        Body of the thread of a client connection : queue its requests until it disconnects.
+        '''
+        reader = connection.makefile('rb')
+        line = reader.readline()
+        if not line:
+            connection.close()
+            return
+        with self.condition:
+            client = Client_Connection(self.next_client_id, connection, json.loads(line))
+            self.clients[client.client_id] = client
+            self.next_client_id += 1
+        print("Client", client.client_id, "connected")
+        try:
+            for line in reader:
+                message = json.loads(line)
+                with self.condition:
+                    client.requests += 1
+                    client.pending += 1
+                    client.max_pending = max(client.max_pending, client.pending)
+                    self.requests.append((client, message['id'], message['slot'], time.time()))
+                    self.condition.notify_all()
+        except OSError:
+            pass
+        # the frames of the client must not be in use anymore when its shared memory is closed
+        with self.condition:
+            while client.pending > 0 and self.running:
+                self.condition.wait()
+            del self.clients[client.client_id]
+        stats = client.stats()
+        print("Client", client.client_id, "disconnected :", stats['requests'], "requests / max queue depth",
+              stats['max_queue_depth'], "/ latency", format_summary(stats['latency']))
+        client.close()
+
+    def next_batch(self):
+        '''
+        Return the next batch of requests, or None when the server stops.
+        '''
+        with self.condition:
+            while self.running and not self.requests:
+                self.condition.wait()
+            if not self.running:
+                return None
+            # the first request waits at most batch_window for others to share its batch
+            deadline = self.requests[0][3] + self.batch_window
+            while self.running and len(self.requests) < self.max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return [self.requests.popleft() for _ in range(min(len(self.requests), self.max_batch))]
+
+    def process(self, batch):
+        '''
+        Run the four stages on a batch of requests, and reply to each of them.
+        '''
+        frames = [client.frames[slot] for client, _, slot, _ in batch]
+        # the smallest models the batch fits in
+        models_batch_size = min(batch_size for batch_size in self.processors if batch_size >= len(batch))
+        results = self.processors[models_batch_size].process(frames, 0)
+        self.batch_sizes.append(len(batch))
+        self.models_batch_sizes.append(models_batch_size)
+        for (client, request_id, _, receive_time), (result, times) in zip(batch, results):
+            latency = time.time() - receive_time
+            client.latencies.append(latency)
+            # no longer pending once replied, as the client can then reuse its slot
+            with self.condition:
+                client.pending -= 1
+                self.condition.notify_all()
+            client.reply(request_id, result, times, latency, len(batch))
+
+    def stats(self):
+        '''
+        Return the server statistics as a dict, with the statistics of the connected clients.
+        '''
+        with self.condition:
+            clients = [client.stats() for client in self.clients.values()]
+        return {'batches': len(self.batch_sizes), 'requests': sum(self.batch_sizes),
+                'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+                # ratio of the inputs of the models which held a request
+                'batch_fill': sum(self.batch_sizes) / sum(self.models_batch_sizes) if self.batch_sizes else 0.0,
+                'clients': clients}
+
+    def close(self):
+        self.stop()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        stats = self.stats()
+        print("Inference server :", stats['requests'], "requests in", stats['batches'], "batches",
+              "(mean batch size {:.2f}, batch fill {:.0%})".format(stats['mean_batch_size'], stats['batch_fill']))
+
+
+class Inference_Client:
+    '''
+    Client of the inference server. The shared memory is created on the first frame, with its shape.
+    The replies are read by a receiver thread as soon as they arrive, so that their round trip time does not include
+    the time before the next submit.
+    '''
+    def __init__(self, socket_path, slots=SLOTS):
+        self.socket_path = socket_path
+        self.slots = slots
+        self.connection = None
+        self.reader = None
+        self.receiver = None
+        self.shared_memory = None
+        self.frames = None
+        self.condition = threading.Condition()
+        self.free_slots = deque(range(slots))
+        # request id -> (slot, send time)
+        self.in_flight = {}
+        # replies received and not returned yet, and whether the server closed the connection
+        self.replies = deque()
+        self.disconnected = False
+        self.next_id = 0
+        self.latencies = []
+
+    def connect(self, shape, dtype):
+        size = self.slots * int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=size)
+        self.frames = np.ndarray((self.slots,) + tuple(shape), dtype=dtype, buffer=self.shared_memory.buf)
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(self.socket_path)
+        self.reader = self.connection.makefile('rb')
+        send_message(self.connection, {'shm': self.shared_memory.name, 'slots': self.slots, 'shape': list(shape),
+                                       'dtype': str(np.dtype(dtype))})
+        self.receiver = threading.Thread(target=self.receive_replies, daemon=True)
+        self.receiver.start()
+
+    def submit(self, frame):
+        '''
+        Copy the frame to a free slot and send its request. Return the request id, and the replies received
+        since the last call (waiting for one if no slot is free).
+        '''
+        if self.connection is None:
+            self.connect(frame.shape, frame.dtype)
+        with self.condition:
+            while not self.free_slots and not self.disconnected:
+                self.condition.wait()
+            if not self.free_slots:
+                raise ConnectionError("The inference server closed the connection.")
+            # the replies received until the slot is taken are all returned now : as the server replies in order,
+            # the reply of the frame submitted slots frames ago is one of them if its slot is needed
+            replies = list(self.replies)
+            self.replies.clear()
+            slot = self.free_slots.popleft()
+            request_id = self.next_id
+            self.next_id += 1
+            np.copyto(self.frames[slot], frame)
+            self.in_flight[request_id] = (slot, time.time())
+        send_message(self.connection, {'id': request_id, 'slot': slot})
+        return request_id, replies
+
+    def receive_replies(self):
+        '''
+        Body of the receiver thread : free the slot of each reply, and time its round trip.
+        '''
+        try:
+            for line in self.reader:
+                reply = json.loads(line)
+                with self.condition:
+                    slot, send_time = self.in_flight.pop(reply['id'])
+                    reply['round_trip'] = time.time() - send_time
+                    self.latencies.append(reply['round_trip'])
+                    self.free_slots.append(slot)
+                    self.replies.append(reply)
+                    self.condition.notify_all()
+        except (OSError, ValueError):
+            # the connection was closed by close
+            pass
+        with self.condition:
+            self.disconnected = True
+            self.condition.notify_all()
+
+    def receive(self):
+        '''
+        Wait for the next reply, and return it with its round trip time.
+        '''
+        with self.condition:
+            while not self.replies and not self.disconnected:
+                self.condition.wait()
+            if not self.replies:
+                raise ConnectionError("The inference server closed the connection.")
+            return self.replies.popleft()
+
+    def flush(self):
+        '''
+        Wait for the replies of all the requests sent.
+        '''
+        with self.condition:
+            count = len(self.in_flight) + len(self.replies)
+        return [self.receive() for _ in range(count)]
+
+    def stats(self):
+        return {'requests': self.next_id, 'round_trip': latency_summary(self.latencies)}
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.shutdown(socket.SHUT_RDWR)
+            self.receiver.join()
+            self.reader.close()
+            self.connection.close()
+            self.connection = None
+        if self.shared_memory is not None:
+            self.frames = None
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+            self.shared_memory = None
+
+
+class Remote_Pipeline:
+    '''
+    Pipeline running the models on the inference server, with the submit / flush interface of the other pipelines.
+    The frames must stay valid until their result is returned : a result can be returned by the submit of the slots-th
+    next frame (when its reply is late), so the last slots + 1 frames submitted must stay valid.
+    '''
+    def __init__(self, client, mirror=False):
+        self.client = client
+        self.mirror = mirror
+        self.frame_index = 0
+        # request id -> Frame_Result
+        self.in_flight = {}
+
+    def submit(self, frame):
+        '''
+        Send the frame to the server, and return the results of the oldest frames when all the slots are busy.
+        '''
+        result = Frame_Result(self.frame_index, frame, self.mirror)
+        self.frame_index += 1
+        request_id, replies = self.client.submit(frame)
+        self.in_flight[request_id] = result
+        return [self.complete(reply) for reply in replies]
+
+    def flush(self):
+        return [self.complete(reply) for reply in self.client.flush()]
+
+    def complete(self, reply):
+        result = self.in_flight.pop(reply['id'])
+        result.face_detected = True
+        if reply['face_box'] is not None:
+            result.face_box = tuple(int(value) for value in reply['face_box'])
+        for name in ('left_eye_box', 'right_eye_box'):
+            if reply[name] is not None:
+                setattr(result, name, tuple(reply[name]))
+        for name in ('landmarks', 'head_pose_angles', 'gaze_vector'):
+            if reply[name] is not None:
+                setattr(result, name, np.array(reply[name]))
+        result.stage_times = reply['stage_times']
+        result.face_detection_time = reply['stage_times'].get('face_detection')
+        result.face_detection_latency = reply['round_trip']
+        result.inference_time = reply['round_trip']
+        return result
+
+    def stats(self):
+        return self.client.stats()
+
+    def close(self):
+        self.client.close()
@@ -6,44 +6,296 @@ Sample usage:
     for batch in feed.next_batch():
         do_something(batch)
     feed.close()
+
+For webcam and video inputs, a background thread owns the cv2.VideoCapture and stores the frames in a
+preallocated ring buffer. Two policies are available :
+- 'nth' : keep every Nth frame (frame_skip=N). Skipped frames are grabbed but never decoded.
+- 'latest' : decode every frame and only give the most recent one to the consumer.
+The iteration stops cleanly at the end of the stream.
+
+The 'images' input gives the images of a directory (or matching a glob pattern such as 'faces/**/*.jpg') in the order
+of their paths. They are decoded by a pool of decode_workers threads, at most prefetch images ahead of the consumer.
+The path of each image given is appended to paths (the images that can not be read are skipped).
+
+The 'replay' input gives the frames of a recording (see record_replay.py) without copy, at their native rate
+or as fast as possible (replay_rate='max'). All the recorded frames are given, whatever the frame_skip.
 '''
+import glob
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
-from numpy import ndarray
+from numpy import empty
+
+from record_replay import Replay
+
+# by default, we keep 1 frame out of 10
+FRAME_SKIP = 10
+RING_BUFFER_SIZE = 4
+IMAGE_EXTENSIONS = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp')
+
+
+def list_images(input_file):
+    '''
+    Return the sorted paths of the images of a directory, or of the files matching a glob pattern.
+    '''
+    if os.path.isdir(input_file):
+        return sorted(os.path.join(input_file, name) for name in os.listdir(input_file)
+                      if name.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(path for path in glob.glob(input_file, recursive=True) if os.path.isfile(path))
+
+
+class FrameRingBuffer:
+    '''
+    Bounded ring of preallocated frames shared between a producer thread and a consumer.
+    The hold_frames last slots given to the consumer are not overwritten until the consumer asks for more frames.
+    '''
+    def __init__(self, capacity, drop_when_full, hold_frames=1):
+        # we need at least the slots held by the consumer, one being written and one ready
+        self.capacity = max(capacity, hold_frames + 2)
+        self.drop_when_full = drop_when_full
+        self.hold_frames = hold_frames
+        self.slots = None
+        self.free = deque(range(self.capacity))
+        self.ready = deque()
+        self.in_use = deque()
+        self.end_of_stream = False
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, shape=None, dtype=None):
+        '''
+        Return the index of a slot the producer can write into, or None if the buffer was closed.
+        The slots are allocated with the shape and dtype of the first frame.
+        If no slot is free, the oldest ready frame is dropped when drop_when_full is set, otherwise we wait.
+        '''
+        with self.condition:
+            if self.slots is None:
+                self.slots = [empty(shape, dtype) for _ in range(self.capacity)]
+            while not self.free:
+                if self.end_of_stream:
+                    return None
+                if self.drop_when_full and self.ready:
+                    self.free.append(self.ready.popleft())
+                    self.dropped += 1
+                else:
+                    self.condition.wait()
+            return self.free.popleft()
+
+    def commit(self, slot, latest_only=False):
+        '''
+        Make the slot available to the consumer. With latest_only, the older ready frames are dropped.
+        '''
+        with self.condition:
+            if latest_only:
+                while self.ready:
+                    self.free.append(self.ready.popleft())
+                    self.dropped += 1
+            self.ready.append(slot)
+            self.condition.notify_all()
+
+    def release(self, slot):
+        '''
+        Give back a slot that the producer could not fill.
+        '''
+        with self.condition:
+            self.free.append(slot)
+            self.condition.notify_all()
+
+    def get(self):
+        '''
+        Return the next frame, or None at the end of the stream.
+        '''
+        with self.condition:
+            if len(self.in_use) >= self.hold_frames:
+                self.free.append(self.in_use.popleft())
+                self.condition.notify_all()
+            while not self.ready:
+                if self.end_of_stream:
+                    return None
+                self.condition.wait()
+            self.in_use.append(self.ready.popleft())
+            return self.slots[self.in_use[-1]]
+
+    def close(self):
+        '''
+        Signal the end of the stream to both the producer and the consumer.
+        '''
+        with self.condition:
+            self.end_of_stream = True
+            self.condition.notify_all()
+
 
 class InputFeeder:
-    def __init__(self, input_type, input_file=None):
+    def __init__(self, input_type, input_file=None, frame_skip=FRAME_SKIP, policy='nth', buffer_size=RING_BUFFER_SIZE,
+                 hold_frames=1, replay=None, replay_rate='native', decode_workers=None):
         '''
         input_type: str, The type of input. Can be 'video' for video file, 'image' for image file,
-                    or 'cam' to use webcam feed.
-        input_file: str, The file that contains the input image or video file. Leave empty for cam input_type.
+                    'images' for a directory of images, 'replay' for a recording, or 'cam' to use webcam feed.
+        input_file: str, The file that contains the input image or video file, the images directory or glob pattern,
+                    or the recording directory. Leave empty for cam input_type.
+        frame_skip: int, With the 'nth' policy, only 1 frame out of frame_skip is decoded and returned.
+        policy: str, 'nth' to get every Nth frame, or 'latest' to always get the most recent frame.
+        buffer_size: int, Number of preallocated frames in the ring buffer.
+        hold_frames: int, Number of frames returned by next_batch that stay valid.
+        replay: Replay, The opened recording of the 'replay' input_type (opened from input_file if not given).
+        replay_rate: str, 'native' to replay the frames at the rate they were recorded, or 'max'.
+        decode_workers: int, Number of threads decoding the images of the 'images' input_type (default: number of cores).
         '''
+        if policy not in ('nth', 'latest'):
+            raise ValueError("Unknown frame policy: " + policy)
         self.input_type=input_type
-        if input_type=='video' or input_type=='image':
+        if input_type in ('video', 'image', 'images', 'replay'):
             self.input_file=input_file
-    
+        self.replay = replay
+        self.replay_rate = replay_rate
+        self.decode_workers = decode_workers or os.cpu_count() or 1
+        # images decoded ahead of the consumer, and paths of the images given
+        self.prefetch = max(buffer_size, 2 * self.decode_workers)
+        self.executor = None
+        self.paths = []
+        self.frame_skip = max(1, frame_skip)
+        self.policy = policy
+        # a webcam does not wait for us : when we are late, the oldest frames are dropped.
+        # A video file can wait, so with the 'nth' policy all the selected frames are kept.
+        self.buffer = FrameRingBuffer(buffer_size, drop_when_full=(input_type == 'cam' or policy == 'latest'),
+                                      hold_frames=hold_frames)
+        self.thread = None
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+
+    @property
+    def frames_dropped(self):
+        '''
+        Number of decoded frames that were never returned by next_batch.
+        '''
+        return self.buffer.dropped
+
     def load_data(self):
+        if self.input_type=='replay':
+            if self.replay is None:
+                self.replay = Replay(self.input_file)
+            return
+        if self.input_type=='images':
+            self.image_files = list_images(self.input_file)
+            if not self.image_files:
+                raise ValueError("No image found in " + self.input_file)
+            self.executor = ThreadPoolExecutor(max_workers=self.decode_workers)
+            return
         if self.input_type=='video':
             self.cap=cv2.VideoCapture(self.input_file)
         elif self.input_type=='cam':
             self.cap=cv2.VideoCapture(0)
         else:
             self.cap=cv2.imread(self.input_file)
+            if self.cap is None:
+                raise ValueError("Could not read the image " + str(self.input_file))
+            return
+        self.thread = threading.Thread(target=self.capture, daemon=True)
+        self.thread.start()
+
+    def capture(self):
+        '''
+        Body of the capture thread : read the frames according to the policy and fill the ring buffer.
+        '''
+        while not self.buffer.end_of_stream:
+            # frames we won't use are only grabbed, not decoded. The frame_skip can be changed while capturing
+            skip = self.frame_skip - 1 if self.policy == 'nth' else 0
+            if not self.grab(skip + 1):
+                break
+            if self.buffer.slots is None:
+                # first frame : its shape gives the size of the preallocated slots
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                slot = self.buffer.acquire(frame.shape, frame.dtype)
+                if slot is None:
+                    break
+                self.buffer.slots[slot][...] = frame
+            else:
+                slot = self.buffer.acquire()
+                if slot is None:
+                    break
+                target = self.buffer.slots[slot]
+                ret, frame = self.cap.retrieve(target)
+                if not ret:
+                    self.buffer.release(slot)
+                    break
+                if frame is not target:
+                    # OpenCV allocated a new image instead of decoding in place
+                    target[...] = frame
+            self.frames_decoded += 1
+            self.buffer.commit(slot, latest_only=(self.policy == 'latest'))
+        self.buffer.close()
+
+    def grab(self, count):
+        '''
+        Grab count frames without decoding them. Return False at the end of the stream.
+        '''
+        for _ in range(count):
+            if not self.cap.grab():
+                return False
+            self.frames_grabbed += 1
+        return True
 
     def next_batch(self):
         '''
-        Returns the next image from either a video file or webcam.
-        If input_type is 'image', then it returns the same image.
+        Returns the next image from either a video file or webcam, until the end of the stream.
+        If input_type is 'image', then it returns the image once.
+        The returned frame is only valid until hold_frames other frames are requested.
         '''
+        if self.input_type=='image':
+            yield self.cap
+            return
+        if self.input_type=='images':
+            yield from self.decode_images()
+            return
+        if self.input_type=='replay':
+            for frame in self.replay.next_frames(self.replay_rate):
+                self.frames_grabbed += 1
+                self.frames_decoded += 1
+                yield frame
+            return
         while True:
-            for _ in range(10):
-                _, frame=self.cap.read()
+            frame = self.buffer.get()
+            if frame is None:
+                return
             yield frame
 
+    def decode_images(self):
+        '''
+        Yield the images in the order of their paths, decoded by the thread pool at most prefetch images ahead.
+        '''
+        files = iter(self.image_files)
+        pending = deque()
+        while True:
+            while len(pending) < self.prefetch:
+                path = next(files, None)
+                if path is None:
+                    break
+                pending.append((path, self.executor.submit(cv2.imread, path)))
+            if not pending:
+                return
+            path, future = pending.popleft()
+            image = future.result()
+            self.frames_grabbed += 1
+            if image is None:
+                print("Could not read the image", path)
+                continue
+            self.frames_decoded += 1
+            self.paths.append(path)
+            yield image
 
     def close(self):
         '''
-        Closes the VideoCapture.
+        Stops the capture thread and closes the VideoCapture.
         '''
-        if not self.input_type=='image':
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        if self.input_type not in ('image', 'images', 'replay'):
+            self.buffer.close()
+            if self.thread is not None:
+                self.thread.join()
             self.cap.release()
-
@@ -0,0 +1,98 @@
+'''
+Load generator of the inference server : several clients send the frames of a clip at the same time, as several
+cameras would, and the round trip latency and the frames per second of each client are displayed.
+
+The frames are decoded once before the clients start, so that the decoding does not limit the load.
+Each client runs in its own thread, with its own connection and shared memory.
+
+Sample usage:
+    python main.py --serve True --server_socket /tmp/pointer_controller.sock --device STUB
+    python load_generator.py --server_socket /tmp/pointer_controller.sock --clients 4 --fps 30
+'''
+import argparse
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from inference_server import Inference_Client
+from run_stats import format_summary, latency_summary
+
+
+def read_frames(input_file, count):
+    '''
+    Return up to count frames of the clip.
+    '''
+    capture = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < count:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    if not frames:
+        raise ValueError("Could not read the frames of " + input_file)
+    return frames
+
+
+def run_client(socket_path, frames, fps, slots, results, index):
+    '''
+    Send the frames to the server at fps frames per second (0 for as fast as possible), and store the client
+    statistics in results[index].
+    '''
+    client = Inference_Client(socket_path, slots)
+    batch_sizes = []
+    start_time = time.time()
+    for frame_index, frame in enumerate(frames):
+        if fps > 0:
+            delay = start_time + frame_index / fps - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        _, replies = client.submit(frame)
+        batch_sizes += [reply['batch_size'] for reply in replies]
+    batch_sizes += [reply['batch_size'] for reply in client.flush()]
+    elapsed = time.time() - start_time
+    client.close()
+    results[index] = {'client': index, 'frames': len(frames), 'frames_per_second': len(frames) / elapsed,
+                      'round_trip': latency_summary(client.latencies), 'mean_batch_size': float(np.mean(batch_sizes))}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("Load generator of the inference server")
+    parser.add_argument('--server_socket', required=True)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--input_file', default='resources/example.mp4')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--fps', type=float, default=0.0)
+    parser.add_argument('--slots', type=int, default=2)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    frames = read_frames(args.input_file, args.frames)
+    results = [None] * args.clients
+    threads = [threading.Thread(target=run_client,
+                                args=(args.server_socket, frames, args.fps, args.slots, results, index))
+               for index in range(args.clients)]
+    start_time = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.time() - start_time
+
+    for result in results:
+        if result is None:
+            continue
+        print("Client", result['client'], ":", "{:.1f} fps".format(result['frames_per_second']),
+              "/ mean batch size {:.2f}".format(result['mean_batch_size']))
+        print("    round trip :", format_summary(result['round_trip']))
+    frames_count = sum(result['frames'] for result in results if result is not None)
+    print("Total : {} frames from {} clients in {:.2f} s ({:.1f} fps)".format(frames_count, args.clients, total_time,
+                                                                           frames_count / total_time))
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump({'clients': results, 'total_time': total_time, 'frames_per_second': frames_count / total_time},
+                      output, indent=2)
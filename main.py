@@ -1,16 +1,35 @@
 '''
 This is the main class for the Computer Pointer Controller.
 '''
-import argparse
+# imported first, as the startup timeline starts when this module is imported
+from startup_timeline import timeline
 
-import cv2
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import time
 
+import execution_config
+from autotune import Autotuner
+import inference_core
+import stub_backend
 from face_detection import Face_Detection
 from facial_landmarks_detection import Facial_Landmarks_Detection
 from gaze_estimation import Gaze_Estimation
 from head_pose_estimation import Head_Pose_Estimation
+from inference_server import Inference_Client, Inference_Server, Remote_Pipeline, batch_sizes
 from input_feeder import InputFeeder
+from face_selector import Face_Selector
+from face_tracker import Face_Tracker
+from motion_gate import Motion_Gate
+from offline import Offline_Processor
+from perf_counters import Perf_Counters
+from qos_controller import QoS_Controller, check_targets
+from record_replay import Recorder, Replay, Replayed_Face_Detection, Replayed_Facial_Landmarks_Detection, \
+    Replayed_Gaze_Estimation, Replayed_Head_Pose_Estimation
+from results_writer import COLUMNS, Results_Writer
+from run_stats import format_summary, latency_summary
+from sinks import Null_Sink, Preview_Sink, Sink_Thread, Video_Sink
+from pipeline import Async_Pipeline, Multi_Face_Pipeline, Serial_Pipeline
 
 # To avoid a very long list of models paths on the command line, here is a list of default models paths.
 from mouse_controller import MouseController
@@ -20,82 +39,473 @@ GAZE_ESTIMATION_MODEL = "models/intel/gaze-estimation-adas-0002/FP32/gaze-estima
 HEAD_POSE_ESTIMATION_MODEL = "models/intel/head-pose-estimation-adas-0001/FP32/head-pose-estimation-adas-0001"
 FACIAL_LANDMARKS_DETECTION_MODEL = "models/intel/landmarks-regression-retail-0009/FP32/landmarks-regression-retail-0009"
 
+timeline.add('imports', timeline.origin, time.time())
+
 class Computer_Pointer_Controller:
 
-    def __init__(self, args):
+    def __init__(self, args, mouse_backend=None):
+
+        self.args = args
+        self.load_time = None
+        # the models are either loaded to serve several clients, or run by the server of another process
+        self.serving = args.serve == "True"
+        self.remote = args.server_socket is not None and not self.serving
+        if self.serving and args.server_socket is None:
+            raise ValueError("The inference server needs a --server_socket path.")
+        if args.qos == 'adaptive':
+            check_targets(args.qos_latency, args.qos_fps)
+        # the face tracking and the motion gate are only done by the local pipelines of a single face
+        if (args.track_face == "True" or args.motion_gate == "True") and (self.remote or args.max_faces > 1):
+            raise ValueError("The face tracking and the motion gate can not be used with --server_socket or with "
+                             "--max_faces over 1.")
+        inference_core.set_cache_dir(args.cache_dir)
+        if args.stub_latencies is not None:
+            stub_backend.set_latencies(parse_latencies(args.stub_latencies))
+
+        # the performance counters are sampled and aggregated, then reported at the end of the run
+        self.perf_counters = None
+        if args.perf_counts == "True":
+            self.perf_counters = Perf_Counters(args.perf_sample_interval, args.perf_snapshot_file,
+                                               args.perf_snapshot_interval, args.perf_port)
+
+        # in asynchronous mode, the face detection needs several infer requests to work on several frames at once
+        num_requests = args.num_requests if args.async_mode == "True" else 1
+        # execution settings (device, threads, streams, bind, infer requests) of each model
+        if args.execution_config == 'auto':
+            settings = execution_config.auto_settings(args.device, num_requests)
+        elif args.execution_config is not None:
+            settings = execution_config.load_settings(args.execution_config, args.device, num_requests)
+        else:
+            settings = execution_config.default_settings(args.device, num_requests)
+        if args.execution is not None:
+            execution_config.apply_overrides(settings, args.execution)
+        execution_config.print_layout(settings)
+        self.execution_settings = settings
+        num_requests = settings['face_detection']['num_requests']
+
+        if args.autotune == "True":
+            # the fastest acceptable precision of each model replaces the one given
+            paths = Autotuner(args.autotune_cache, args.autotune_clip, args.autotune_tolerance,
+                              extensions=args.extensions).tune(
+                {'face_detection': args.face_detection_model, 'landmarks': args.facial_landmarks_detection_model,
+                 'head_pose': args.head_pose_estimation_model, 'gaze': args.gaze_estimation_model}, settings)
+            args.face_detection_model = paths['face_detection']
+            args.facial_landmarks_detection_model = paths['landmarks']
+            args.head_pose_estimation_model = paths['head_pose']
+            args.gaze_estimation_model = paths['gaze']
+
+        # a recording is replayed from a memory-mapped file, and its recorded outputs can stand in for some models
+        self.replay = Replay(args.input_file) if args.input_type == 'replay' else None
+        replay_stages = args.replay_stages.split(',') if args.replay_stages is not None else []
+        for stage in replay_stages:
+            if stage not in execution_config.MODELS:
+                raise ValueError("Unknown stage to replay: " + stage)
+        if replay_stages and self.replay is None:
+            raise ValueError("The stages can only be replayed with the 'replay' input type.")
 
         # load the objects corresponding to the models
-        self.face_detection = Face_Detection(args.face_detection_model, args.device, args.extensions, args.perf_counts)
-        self.gaze_estimation = Gaze_Estimation(args.gaze_estimation_model, args.device, args.extensions, args.perf_counts)
-        self.head_pose_estimation = Head_Pose_Estimation(args.head_pose_estimation_model, args.device, args.extensions, args.perf_counts)
-        self.facial_landmarks_detection = Facial_Landmarks_Detection(args.facial_landmarks_detection_model, args.device, args.extensions, args.perf_counts)
+        self.face_detection, self.facial_landmarks_detection, self.head_pose_estimation, self.gaze_estimation = \
+            self.create_models(settings, replay_stages)
+        # in offline mode, each inference processes a batch of frames. A set of images is always processed offline
+        self.offline = args.offline == "True" or args.input_type == 'images'
+        batch_size = args.batch_size if self.offline else 1
+        if self.serving:
+            # the frames of all the clients are batched, up to server_batch frames per inference
+            batch_size = args.server_batch
+        # with several faces, the faces of a frame are processed as a batch by the three other models
+        faces_batch_size = batch_size
+        if args.max_faces > 1 and not self.offline and not self.serving:
+            faces_batch_size = args.max_faces
+
+        # the models to load, with the batch size of the frames and of the faces
+        models_sets = [("", (self.face_detection, self.facial_landmarks_detection, self.head_pose_estimation,
+                             self.gaze_estimation), batch_size, faces_batch_size)]
+        if self.serving:
+            # a batch runs on the smallest models it fits in, so the models are loaded once for each batch size
+            self.server_models = {size: self.create_models(settings, replay_stages)
+                                  for size in batch_sizes(batch_size) if size != batch_size}
+            self.server_models[batch_size] = models_sets[0][1]
+            models_sets = [(" (batch {})".format(size), models, size, size)
+                           for size, models in sorted(self.server_models.items())]
 
+        # the four models are read and compiled at the same time, while the video feed is opened
         start_models_load_time = time.time()
-        self.face_detection.load_model()
-        self.gaze_estimation.load_model()
-        self.head_pose_estimation.load_model()
-        self.facial_landmarks_detection.load_model()
-        print("Models total loading time :", time.time() - start_models_load_time)
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            feed_future = None
+            if args.prewarm_cache != "True" and not self.serving:
+                feed_future = executor.submit(self.open_feed)
+            models_futures = []
+            for suffix, models, models_batch_size, models_faces_batch_size in [] if self.remote else models_sets:
+                face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation = models
+                models_futures += [
+                    executor.submit(self.load_model, "face detection" + suffix, face_detection,
+                                    settings['face_detection'], models_batch_size),
+                    executor.submit(self.load_model, "gaze estimation" + suffix, gaze_estimation, settings['gaze'],
+                                    models_faces_batch_size),
+                    executor.submit(self.load_model, "head pose estimation" + suffix, head_pose_estimation,
+                                    settings['head_pose'], models_faces_batch_size),
+                    executor.submit(self.load_model, "facial landmarks detection" + suffix,
+                                    facial_landmarks_detection, settings['landmarks'], models_faces_batch_size)
+                ]
+            for future in models_futures:
+                future.result()
+            self.load_time = time.time() - start_models_load_time
+            print("Models total loading time :", self.load_time)
+            if feed_future is not None:
+                self.feed = feed_future.result()
+        if args.cache_dir is not None:
+            warm_starts, models_count = inference_core.warm_start_count()
+            print("Models imported from the cache (warm start) :", warm_starts, "/", models_count)
+            for model_structure, device, status, loading_time in inference_core.load_reports:
+                print("   ", model_structure, "on", device, ":", status, "in", loading_time)
+        if args.prewarm_cache == "True":
+            # the cache is now filled, nothing else to do
+            return
+        if self.serving:
+            self.server = Inference_Server(self.server_models, args.server_socket, args.server_batch_window,
+                                           mirror=True)
+            return
+        if self.offline:
+            # the results go to a file instead of the mouse pointer
+            self.processor = Offline_Processor(self.face_detection, self.facial_landmarks_detection,
+                                               self.head_pose_estimation, self.gaze_estimation, batch_size, mirror=True)
+            return
 
-        # open the video feed
-        self.feed = InputFeeder(args.input_type, args.input_file)
-        self.feed.load_data()
+        # the processed frames (and the outputs of the models) can be recorded to be replayed later
+        self.recorder = None
+        if args.record_dir is not None:
+            self.recorder = Recorder(args.record_dir, args.record_outputs == "True")
+
+        # the display and the video writing run in their own threads, dropping frames when they are late
+        sinks = []
+        if args.show_face == "True":
+            sinks.append(Preview_Sink())
+        if args.output_video is not None:
+            sinks.append(Video_Sink(args.output_video, args.output_video_fps))
+        self.sinks = [Sink_Thread(sink, args.sink_queue_size) for sink in sinks or [Null_Sink()]]
 
         # init mouse controller
-        self.mouse_controller = MouseController('low', 'fast')
+        self.mouse_controller = MouseController('low', 'fast', args.smoothing, mouse_backend)
+
+        # in tracking mode, the face detection only runs on some frames
+        self.tracker = None
+        if args.track_face == "True":
+            self.tracker = Face_Tracker(args.redetect_interval)
+        elif args.qos == 'adaptive' and args.max_faces == 1 and not self.remote:
+            # the QoS controller changes how often the face detection runs, starting from every frame
+            self.tracker = Face_Tracker(1)
+
+        # with the motion gate, the results of the previous frame are reused while the face does not change
+        self.gate = None
+        if args.motion_gate == "True":
+            self.gate = Motion_Gate(args.motion_threshold, args.refresh_interval)
+
+        if self.remote:
+            self.pipeline = Remote_Pipeline(Inference_Client(args.server_socket, args.server_slots), mirror=True)
+        elif args.max_faces > 1:
+            self.pipeline = Multi_Face_Pipeline(self.face_detection, self.facial_landmarks_detection,
+                                                self.head_pose_estimation, self.gaze_estimation,
+                                                Face_Selector(args.face_selection), args.max_faces, mirror=True)
+        elif args.async_mode == "True":
+            self.pipeline = Async_Pipeline(self.face_detection, self.facial_landmarks_detection,
+                                           self.head_pose_estimation, self.gaze_estimation, num_requests, self.tracker,
+                                           mirror=True, gate=self.gate)
+        else:
+            self.pipeline = Serial_Pipeline(self.face_detection, self.facial_landmarks_detection,
+                                            self.head_pose_estimation, self.gaze_estimation, self.tracker, mirror=True,
+                                            gate=self.gate)
+
+        # the adaptive QoS keeps the frames latency within the budget, the fixed one keeps the settings as they are
+        self.qos = None
+        if args.qos == 'adaptive':
+            # the input scale of the face detection can only change when it runs in this process
+            face_detection = self.face_detection
+            if self.remote or not isinstance(face_detection, Face_Detection):
+                face_detection = None
+            self.qos = QoS_Controller(args.qos_latency, args.qos_fps, self.feed, self.tracker, face_detection,
+                                      self.gate)
+
+    def create_models(self, settings, replay_stages):
+        '''
+        This method creates the objects of the four models (not loaded yet), the recorded outputs standing in for
+        the replayed stages.
+        '''
+        args = self.args
+        if 'face_detection' in replay_stages:
+            face_detection = Replayed_Face_Detection(self.replay)
+        else:
+            face_detection = Face_Detection(args.face_detection_model, settings['face_detection']['device'],
+                                            args.extensions, self.perf_counters, args.nms_threshold)
+        if 'gaze' in replay_stages:
+            gaze_estimation = Replayed_Gaze_Estimation(self.replay)
+        else:
+            gaze_estimation = Gaze_Estimation(args.gaze_estimation_model, settings['gaze']['device'],
+                                              args.extensions, self.perf_counters)
+        if 'head_pose' in replay_stages:
+            head_pose_estimation = Replayed_Head_Pose_Estimation(self.replay)
+        else:
+            head_pose_estimation = Head_Pose_Estimation(args.head_pose_estimation_model,
+                                                        settings['head_pose']['device'], args.extensions,
+                                                        self.perf_counters)
+        if 'landmarks' in replay_stages:
+            facial_landmarks_detection = Replayed_Facial_Landmarks_Detection(self.replay)
+        else:
+            facial_landmarks_detection = Facial_Landmarks_Detection(args.facial_landmarks_detection_model,
+                                                                    settings['landmarks']['device'],
+                                                                    args.extensions, self.perf_counters)
+        return face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation
+
+    def load_model(self, name, model, settings, batch_size):
+        '''
+        This method reads and compiles a model with its execution settings, recording both phases in the startup timeline.
+        '''
+        with timeline.phase("IR read " + name):
+            model.read_model()
+        with timeline.phase("compile " + name):
+            model.load_model(settings['num_requests'], batch_size, execution_config.plugin_config(settings))
+
+    def open_feed(self):
+        '''
+        This method opens the video feed.
+        '''
+        with timeline.phase("capture open"):
+            # the frames are not copied, so the feed must keep the frames in the pipeline valid
+            hold_frames = self.execution_settings['face_detection']['num_requests'] if self.args.async_mode == "True" else 1
+            if self.remote:
+                # a frame is held until the server replies, which can be after server_slots other frames were submitted
+                hold_frames = self.args.server_slots + 1
+            buffer_size = 4
+            if self.offline:
+                # a whole batch is held while the next one is decoded
+                hold_frames = self.args.batch_size
+                buffer_size = 2 * self.args.batch_size
+            feed = InputFeeder(self.args.input_type, self.args.input_file, self.args.frame_skip, self.args.frame_policy,
+                               buffer_size, hold_frames, self.replay, self.args.replay_rate, self.args.decode_workers)
+            feed.load_data()
+        return feed
+
+    def run_offline(self):
+        '''
+        This method processes all the frames by batches and writes the results to the output file.
+        '''
+        # the results of a set of images are written with the path of each image
+        columns = COLUMNS + ['path'] if self.args.input_type == 'images' else COLUMNS
+        writer = Results_Writer(self.args.output_file, columns)
+        stats = self.processor.run(self.feed, writer)
+        writer.close()
+        self.feed.close()
+        print("Offline processing of", stats['frames'], "frames by batches of", stats['batch_size'],
+              "in", stats['total_time'], "s")
+        print("Throughput (frames per second):", stats['frames_per_second'])
+        for stage in ('face_detection_time', 'landmarks_time', 'head_pose_time', 'gaze_time'):
+            print("Total", stage, ":", stats[stage])
+        print("Results written to", self.args.output_file)
+        self.report_perf_counters()
+        return stats
+
+    def report_perf_counters(self):
+        '''
+        This method prints the hottest layers of each model, and stops the performance counters exports.
+        '''
+        if self.perf_counters is not None:
+            self.perf_counters.report(self.args.perf_top)
+            self.perf_counters.close()
 
     def run(self):
         '''
-        This method process each frame.
+        This method process each frame, and returns the run statistics.
         '''
+        if self.serving:
+            self.server.serve()
+            return self.server.stats()
+        if self.offline:
+            return self.run_offline()
         inferences_times = []
         face_detections_times = []
+        self.stage_times = {'face_detection': [], 'landmarks': [], 'head_pose': [], 'gaze': []}
+        self.face_detection_latencies = []
+        start_time = time.time()
+        try:
+            processed_frames = self.process_frames(inferences_times, face_detections_times)
+        except BaseException:
+            # the capture thread is stopped before the error goes up
+            self.feed.close()
+            raise
+        total_time = time.time() - start_time
+
+        self.feed.close()
+        if self.remote:
+            print("Inference server round trip :", format_summary(self.pipeline.stats()['round_trip']))
+            self.pipeline.close()
+        if self.recorder is not None:
+            self.recorder.close()
+            print("Frames recorded to", self.args.record_dir)
+        for sink in self.sinks:
+            sink.close()
+        # raises the error of the actuator thread, if any
+        self.mouse_controller.close()
+        if not inferences_times:
+            print("No face was found in the", processed_frames, "processed frames.")
+        else:
+            print("Average face detection inference time:", sum(face_detections_times) / len(face_detections_times))
+            print("Average face detection latency (from the frame submission):",
+                  sum(self.face_detection_latencies) / len(self.face_detection_latencies))
+            print("Average total inferences time:", sum(inferences_times) / len(inferences_times))
+        inferences_summary = latency_summary(inferences_times)
+        print("Total inferences time :", format_summary(inferences_summary))
+        stages_summaries = {stage: latency_summary(times) for stage, times in self.stage_times.items()}
+        for stage, summary in stages_summaries.items():
+            print("   ", stage, ":", format_summary(summary))
+        fps = processed_frames / total_time if total_time > 0 else 0.0
+        print("Processed frames per second:", fps)
+        print("Frames grabbed:", self.feed.frames_grabbed, "/ decoded:", self.feed.frames_decoded,
+              "/ dropped:", self.feed.frames_dropped)
+        print("Gaze vectors sent to the mouse controller:", self.mouse_controller.updates,
+              "/ merged before being used:", self.mouse_controller.merged_updates)
+        if self.tracker is not None:
+            print("Face tracking statistics :", self.tracker.stats())
+        if self.gate is not None:
+            print("Motion gate statistics :", self.gate.stats())
+        if self.qos is not None:
+            print("QoS statistics :", self.qos.stats())
+        sinks_stats = [sink.stats() for sink in self.sinks]
+        for stats in sinks_stats:
+            print("Sink statistics :", stats)
+        self.report_perf_counters()
+        return {'frames': processed_frames, 'total_time': total_time, 'frames_per_second': fps,
+                'end_to_end': inferences_summary, 'stages': stages_summaries, 'sinks': sinks_stats}
+
+    def process_frames(self, inferences_times, face_detections_times):
+        '''
+        This method submits each frame of the feed to the pipeline, and returns the number of processed frames.
+        '''
+        processed_frames = 0
         for batch in self.feed.next_batch():
             if batch is None:
                 break
+            timeline.mark("first frame")
 
-            # as we want the webcam to act as a mirror, flip the frame
-            batch = cv2.flip(batch, 1)
-
-            inference_time = time.time()
-            face = self.face_detection.predict(batch)
-            if face is None:
-                continue
-            else:
-                face_detections_times.append(time.time() - inference_time)
-
-                left_eye_image, right_eye_image = self.facial_landmarks_detection.predict(face)
-                if left_eye_image is None or right_eye_image is None:
-                    continue
-                head_pose_angles = self.head_pose_estimation.predict(face)
-                if head_pose_angles is None:
-                    continue
-                vector = self.gaze_estimation.predict(left_eye_image, right_eye_image, head_pose_angles)
-                inferences_times.append(time.time() - inference_time)
-                if args.show_face == "True":
-                    cv2.imshow("Detected face", face)
-                    cv2.waitKey(1)
-                self.mouse_controller.move(vector[0], vector[1])
+            # as we want the webcam to act as a mirror, the pipeline works on the mirrored frame (without flipping it)
+            for result in self.pipeline.submit(batch):
+                processed_frames += 1
+                self.process_result(result, inferences_times, face_detections_times)
+            if self.qos is not None and self.qos.pending_scale is not None:
+                # the face detection network is reshaped once no frame is in the pipeline
+                for result in self.pipeline.flush():
+                    processed_frames += 1
+                    self.process_result(result, inferences_times, face_detections_times)
+                self.qos.apply_scale()
+        for result in self.pipeline.flush():
+            processed_frames += 1
+            self.process_result(result, inferences_times, face_detections_times)
+        return processed_frames
 
-        self.feed.close()
-        cv2.destroyAllWindows()
-        print("Average face detection inference time:", sum(face_detections_times) / len(face_detections_times))
-        print("Average total inferences time:", sum(inferences_times) / len(inferences_times))
+    def process_result(self, result, inferences_times, face_detections_times):
+        '''
+        This method uses the outputs of the models for a frame to move the mouse pointer.
+        '''
+        if self.recorder is not None:
+            self.recorder.write(result)
+        if self.qos is not None:
+            self.qos.observe(result)
+        for stage, stage_time in result.stage_times.items():
+            self.stage_times[stage].append(stage_time)
+        for sink in self.sinks:
+            sink.put(result)
+        if result.face_box is None:
+            return
+        if result.face_detected:
+            face_detections_times.append(result.face_detection_time)
+            self.face_detection_latencies.append(result.face_detection_latency)
+        if result.gaze_vector is None:
+            return
+        if timeline.elapsed("first gaze vector") is None:
+            timeline.mark("first gaze vector")
+            timeline.report()
+            print("Time to first cursor move :", timeline.elapsed("first gaze vector"))
+        inferences_times.append(result.inference_time)
+        self.mouse_controller.move(result.gaze_vector[0], result.gaze_vector[1])
 
-if __name__ == '__main__':
+def parse_latencies(text):
+    '''
+    Return the dict of model kind -> latency (in seconds) of a text like "face_detection=0.02,gaze=0.003".
+    '''
+    latencies = {}
+    for item in text.split(','):
+        kind, latency = item.split('=')
+        if kind.strip() not in stub_backend.LATENCIES:
+            raise ValueError("Unknown stub model kind: " + kind)
+        latencies[kind.strip()] = float(latency)
+    return latencies
+
+
+def build_parser():
+    '''
+    Return the parser of the command line arguments.
+    '''
     parser = argparse.ArgumentParser()
     parser.add_argument('--face_detection_model', default=FACE_DETECTION_MODEL)
     parser.add_argument('--gaze_estimation_model', default=GAZE_ESTIMATION_MODEL)
     parser.add_argument('--head_pose_estimation_model', default=HEAD_POSE_ESTIMATION_MODEL)
     parser.add_argument('--facial_landmarks_detection_model', default=FACIAL_LANDMARKS_DETECTION_MODEL)
     parser.add_argument('--device', default='CPU')
+    parser.add_argument('--execution_config', default=None)
+    parser.add_argument('--execution', default=None)
+    parser.add_argument('--autotune', default='False')
+    parser.add_argument('--autotune_cache', default='autotune.json')
+    parser.add_argument('--autotune_clip', default=None)
+    parser.add_argument('--autotune_tolerance', type=float, default=0.05)
     parser.add_argument('--extensions', default=None)
     parser.add_argument('--input_type', default='cam')
     parser.add_argument('--input_file', default=None)
+    parser.add_argument('--decode_workers', type=int, default=None)
+    parser.add_argument('--replay_rate', default='native', choices=['native', 'max'])
+    parser.add_argument('--replay_stages', default=None)
+    parser.add_argument('--record_dir', default=None)
+    parser.add_argument('--record_outputs', default='False')
     parser.add_argument('--show_face', default='True')
+    parser.add_argument('--output_video', default=None)
+    parser.add_argument('--output_video_fps', type=float, default=25.0)
+    parser.add_argument('--sink_queue_size', type=int, default=2)
     parser.add_argument('--perf_counts', default='False')
+    parser.add_argument('--perf_sample_interval', type=int, default=100)
+    parser.add_argument('--perf_snapshot_file', default=None)
+    parser.add_argument('--perf_snapshot_interval', type=float, default=10.0)
+    parser.add_argument('--perf_port', type=int, default=None)
+    parser.add_argument('--perf_top', type=int, default=10)
+    parser.add_argument('--async_mode', default='False')
+    parser.add_argument('--num_requests', type=int, default=2)
+    parser.add_argument('--frame_skip', type=int, default=10)
+    parser.add_argument('--frame_policy', default='nth', choices=['nth', 'latest'])
+    parser.add_argument('--offline', default='False')
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--output_file', default='results.csv')
+    parser.add_argument('--max_faces', type=int, default=1)
+    parser.add_argument('--face_selection', default='first', choices=['first', 'largest', 'central', 'sticky'])
+    parser.add_argument('--nms_threshold', type=float, default=None)
+    parser.add_argument('--track_face', default='False')
+    parser.add_argument('--redetect_interval', type=int, default=10)
+    parser.add_argument('--motion_gate', default='False')
+    parser.add_argument('--motion_threshold', type=float, default=0.02)
+    parser.add_argument('--refresh_interval', type=int, default=10)
+    parser.add_argument('--serve', default='False')
+    parser.add_argument('--server_socket', default=None)
+    parser.add_argument('--server_batch', type=int, default=8)
+    parser.add_argument('--server_batch_window', type=float, default=0.005)
+    parser.add_argument('--server_slots', type=int, default=2)
+    parser.add_argument('--cache_dir', default=None)
+    parser.add_argument('--prewarm_cache', default='False')
+    parser.add_argument('--qos', default='fixed', choices=['fixed', 'adaptive'])
+    parser.add_argument('--qos_latency', type=float, default=None)
+    parser.add_argument('--qos_fps', type=float, default=None)
+    parser.add_argument('--smoothing', default='exponential', choices=['none', 'exponential', 'one_euro', 'kalman'])
+    parser.add_argument('--stub_latencies', default=None)
+    return parser
 
-    args = parser.parse_args()
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
 
     computer_pointer_controller = Computer_Pointer_Controller(args)
-    computer_pointer_controller.run()
+    if args.prewarm_cache != "True":
+        computer_pointer_controller.run()
@@ -0,0 +1,101 @@
+'''
+This class skips the facial landmarks detection, head pose estimation and gaze estimation on static frames.
+
+A signature of the face and of each eye is a small grayscale image of the region (signature_size pixels square).
+On each frame, the signatures of the face (in its new box) and of the eyes (in the boxes of the reference frame)
+are compared to those of the reference frame, the last frame on which the three models ran. When the face box
+did not move by more than max_shift times its width, and the mean absolute difference of each signature is below
+threshold (in 0..1 gray levels), the results of the reference frame are reused.
+As frames are compared to the reference and not to their previous frame, a slow drift ends up above the threshold ;
+the models also run again after refresh_interval frames reusing the same results, so that they never go stale.
+'''
+import cv2
+import numpy as np
+
+from preprocessing import warp_region
+
+THRESHOLD = 0.02
+REFRESH_INTERVAL = 10
+SIGNATURE_SIZE = 16
+MAX_SHIFT = 0.05
+
+
+class Motion_Gate:
+    def __init__(self, threshold=THRESHOLD, refresh_interval=REFRESH_INTERVAL, signature_size=SIGNATURE_SIZE,
+                 max_shift=MAX_SHIFT):
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.signature_size = signature_size
+        self.max_shift = max_shift
+        # result of the reference frame, and signatures of its face and eyes
+        self.reference = None
+        self.signatures = None
+        self.reused_frames = 0
+        # statistics
+        self.frames = 0
+        self.skipped = 0
+        self.refreshes = 0
+
+    def signature(self, frame, box, mirror):
+        '''
+        Return the signature of the box (x, y, w, h) of the frame.
+        '''
+        # the region is resized in two steps, as an area interpolation averages the noise of the camera
+        image = warp_region(frame, box, (4 * self.signature_size, 4 * self.signature_size), mirror)
+        image = cv2.resize(image, (self.signature_size, self.signature_size), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255
+
+    def reuse(self, result):
+        '''
+        If the face of the result did not change since the reference frame, copy the landmarks, eyes boxes,
+        head pose angles and gaze vector of the reference frame into the result and return True.
+        '''
+        self.frames += 1
+        reference = self.reference
+        if reference is None:
+            return False
+        if self.reused_frames >= self.refresh_interval:
+            self.refreshes += 1
+            return False
+        x, y, w, h = result.face_box
+        reference_x, reference_y, reference_w, reference_h = reference.face_box
+        if max(abs(x - reference_x), abs(y - reference_y), abs(w - reference_w)) > self.max_shift * reference_w:
+            return False
+        boxes = (result.face_box, reference.left_eye_box, reference.right_eye_box)
+        for box, reference_signature in zip(boxes, self.signatures):
+            change = np.mean(np.abs(self.signature(result.frame, box, result.mirror) - reference_signature))
+            if change > self.threshold:
+                return False
+        result.landmarks = reference.landmarks
+        result.left_eye_box = reference.left_eye_box
+        result.right_eye_box = reference.right_eye_box
+        result.head_pose_angles = reference.head_pose_angles
+        result.gaze_vector = reference.gaze_vector
+        result.reused = True
+        self.reused_frames += 1
+        self.skipped += 1
+        return True
+
+    def set_reference(self, result):
+        '''
+        Make the result, on which the three models ran, the new reference.
+        '''
+        self.reference = result
+        self.signatures = [self.signature(result.frame, box, result.mirror)
+                           for box in (result.face_box, result.left_eye_box, result.right_eye_box)]
+        self.reused_frames = 0
+
+    def stats(self):
+        '''
+        Return the gate statistics as a dict.
+        '''
+        return {
+            'threshold': self.threshold,
+            'refresh_interval': self.refresh_interval,
+            'frames': self.frames,
+            # frames on which the three models were skipped, so 3 inferences skipped each
+            'skipped_frames': self.skipped,
+            'skipped_inferences': 3 * self.skipped,
+            'refreshes': self.refreshes,
+            'skip_rate': self.skipped / self.frames if self.frames else 0.0
+        }
@@ -1,22 +1,259 @@
 '''
 This is a sample class that you can use to control the mouse pointer.
 It uses the pyautogui library. You can set the precision for mouse movement
-(how much the mouse moves) and the speed (how fast it moves) by changing 
+(how much the mouse moves) and the speed (how fast it moves) by changing
 precision_dict and speed_dict.
 Calling the move function with the x and y output of the gaze estimation model
 will move the pointer.
-This class is provided to help get you started; you can choose whether you want to use it or create your own from scratch.
+
+The move function does not block : the pointer is driven by a dedicated thread at a fixed rate.
+Only the latest gaze vector is kept (older ones not yet used are merged into it), and it is smoothed
+by a pluggable filter ('exponential', 'one_euro', 'kalman' or 'none').
+The pointer keeps moving in the direction of the latest gaze vector during speed seconds,
+so a gaze vector moves the pointer of precision pixels if it is not replaced by a newer one.
+
+The backend actually moving the pointer can be replaced, e.g. by a RecordingBackend to run without display.
+The default pyautogui backend is only created (and pyautogui imported) with the first gaze vector, on the thread
+calling move, so that a missing pyautogui or display raises there. An error of the actuator thread stops it, and is
+raised by the next call to move or close.
 '''
-import pyautogui
+import math
+import threading
+import time
+
+# rate (in Hz) at which the actuator thread moves the pointer
+ACTUATOR_RATE = 60
+
+
+class PyAutoGUIBackend:
+    '''
+    Move the real mouse pointer with pyautogui.
+    '''
+    def __init__(self):
+        # pyautogui needs a display, so it is only imported when the real pointer is used
+        import pyautogui
+        pyautogui.FAILSAFE = False
+        # by default, pyautogui sleeps 0.1s after each call
+        pyautogui.PAUSE = 0
+        self.pyautogui = pyautogui
+
+    def move_rel(self, dx, dy):
+        self.pyautogui.moveRel(dx, dy, duration=0)
+
+
+class RecordingBackend:
+    '''
+    Headless backend recording the moves (timestamp, dx, dy) instead of moving the pointer.
+    '''
+    def __init__(self):
+        self.moves = []
+        self.lock = threading.Lock()
+
+    def move_rel(self, dx, dy):
+        with self.lock:
+            self.moves.append((time.time(), dx, dy))
+
+    def position(self):
+        '''
+        Return the total displacement of the pointer.
+        '''
+        with self.lock:
+            return sum(move[1] for move in self.moves), sum(move[2] for move in self.moves)
+
+
+class NoFilter:
+    '''
+    Use the gaze vectors as they are.
+    '''
+    def update(self, value, timestamp):
+        return value
+
+    def reset(self):
+        pass
+
+
+class ExponentialFilter:
+    '''
+    Exponential moving average of the gaze vectors : the higher alpha, the more reactive.
+    '''
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, value, timestamp):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value = tuple(self.alpha * v + (1 - self.alpha) * s for v, s in zip(value, self.value))
+        return self.value
+
+    def reset(self):
+        self.value = None
+
+
+class OneEuroFilter:
+    '''
+    1€ filter (Casiez et al.) : strong smoothing when the gaze is steady, low lag when it moves fast.
+    '''
+    def __init__(self, min_cutoff=1.0, beta=0.5, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    @staticmethod
+    def smoothing_factor(cutoff, elapsed):
+        r = 2 * math.pi * cutoff * elapsed
+        return r / (r + 1)
+
+    def update(self, value, timestamp):
+        if self.value is None:
+            self.value = value
+            self.derivative = tuple(0.0 for _ in value)
+            self.timestamp = timestamp
+            return self.value
+        elapsed = max(timestamp - self.timestamp, 1e-6)
+        self.timestamp = timestamp
+        a_d = self.smoothing_factor(self.d_cutoff, elapsed)
+        self.derivative = tuple(a_d * (v - s) / elapsed + (1 - a_d) * d
+                                for v, s, d in zip(value, self.value, self.derivative))
+        filtered = []
+        for v, s, d in zip(value, self.value, self.derivative):
+            a = self.smoothing_factor(self.min_cutoff + self.beta * abs(d), elapsed)
+            filtered.append(a * v + (1 - a) * s)
+        self.value = tuple(filtered)
+        return self.value
+
+    def reset(self):
+        self.value = None
+        self.derivative = None
+        self.timestamp = None
+
+
+class KalmanFilter:
+    '''
+    Kalman filter with a constant position model, run independently on each component of the gaze vector.
+    '''
+    def __init__(self, process_noise=1e-2, measurement_noise=1e-1):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.reset()
+
+    def update(self, value, timestamp):
+        if self.value is None:
+            self.value = value
+            self.error = tuple(1.0 for _ in value)
+            return self.value
+        filtered = []
+        errors = []
+        for v, s, e in zip(value, self.value, self.error):
+            e += self.process_noise
+            gain = e / (e + self.measurement_noise)
+            filtered.append(s + gain * (v - s))
+            errors.append((1 - gain) * e)
+        self.value = tuple(filtered)
+        self.error = tuple(errors)
+        return self.value
+
+    def reset(self):
+        self.value = None
+        self.error = None
+
+
+FILTERS = {'none': NoFilter, 'exponential': ExponentialFilter, 'one_euro': OneEuroFilter, 'kalman': KalmanFilter}
+
 
 class MouseController:
-    def __init__(self, precision, speed):
+    def __init__(self, precision, speed, smoothing='exponential', backend=None, rate=ACTUATOR_RATE):
         precision_dict={'high':100, 'low':1000, 'medium':500}
         speed_dict={'fast':1, 'slow':10, 'medium':5}
 
-        pyautogui.FAILSAFE = False
         self.precision=precision_dict[precision]
         self.speed=speed_dict[speed]
+        self.filter = FILTERS[smoothing]()
+        self.backend = backend
+        self.rate = rate
+
+        # latest gaze vector received, and the time it was received
+        self.target = None
+        self.target_time = None
+        self.pending = False
+        self.lock = threading.Lock()
+        self.updates = 0
+        self.merged_updates = 0
+        self.ticks = 0
+        # error which stopped the actuator thread
+        self.error = None
+
+        self.running = True
+        self.thread = threading.Thread(target=self.actuate, daemon=True)
+        self.thread.start()
 
     def move(self, x, y):
-        pyautogui.moveRel(x*self.precision, -1*y*self.precision, duration=self.speed)
+        '''
+        Give a new gaze vector to the actuator thread. Never blocks.
+        '''
+        self.check_error()
+        if self.backend is None:
+            self.backend = PyAutoGUIBackend()
+        with self.lock:
+            if self.pending:
+                # the previous vector was not used yet : the newest one wins
+                self.merged_updates += 1
+            self.target = (float(x), float(y))
+            self.target_time = time.time()
+            self.pending = True
+            self.updates += 1
+
+    def actuate(self):
+        '''
+        Body of the actuator thread : move the pointer at a fixed rate toward the smoothed latest gaze vector.
+        '''
+        try:
+            self.actuate_loop()
+        except Exception as error:
+            self.error = error
+
+    def actuate_loop(self):
+        period = 1.0 / self.rate
+        # pixels per tick for a gaze vector of 1, as a gaze vector moves the pointer of precision pixels in speed seconds
+        step = self.precision / (self.speed * self.rate)
+        remainder_x = 0.0
+        remainder_y = 0.0
+        next_tick = time.time()
+        while self.running:
+            now = time.time()
+            with self.lock:
+                target = self.target
+                target_time = self.target_time
+                self.pending = False
+            if target is None or now - target_time > self.speed:
+                # no recent gaze vector : the pointer stays still
+                self.filter.reset()
+                remainder_x = remainder_y = 0.0
+            else:
+                x, y = self.filter.update(target, now)
+                remainder_x += x * step
+                remainder_y += -1 * y * step
+                dx = int(remainder_x)
+                dy = int(remainder_y)
+                if dx != 0 or dy != 0:
+                    self.backend.move_rel(dx, dy)
+                    remainder_x -= dx
+                    remainder_y -= dy
+            self.ticks += 1
+            # if we are late, do not try to catch up the missed ticks
+            next_tick = max(next_tick + period, now)
+            time.sleep(max(0.0, next_tick - time.time()))
+
+    def close(self):
+        '''
+        Stop the actuator thread.
+        '''
+        self.running = False
+        self.thread.join()
+        self.check_error()
+
+    def check_error(self):
+        if self.error is not None:
+            raise RuntimeError("The mouse pointer could not be moved: " + str(self.error)) from self.error
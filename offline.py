@@ -0,0 +1,106 @@
+'''
+This class analyzes a recorded video offline, for throughput rather than latency.
+
+The four networks are reshaped to process batch_size images per inference. The frames are decoded ahead by the
+InputFeeder thread, then each stage runs once per batch of frames : face detection on the frames, facial landmarks
+detection and head pose estimation on the faces found, and gaze estimation on the eyes.
+The results are written to a columnar file (see results_writer.py) instead of moving the mouse pointer.
+With the 'images' input of the InputFeeder, the path of each image is written with its results.
+
+Sample usage:
+    processor = Offline_Processor(face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation, 8)
+    stats = processor.run(feed, Results_Writer('results.csv'))
+'''
+import time
+
+from pipeline import Frame_Result
+from results_writer import result_row
+
+
+class Offline_Processor:
+    '''
+    The models must have been loaded with a batch size of batch_size.
+    '''
+    def __init__(self, face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation, batch_size,
+                 mirror=True):
+        self.face_detection = face_detection
+        self.facial_landmarks_detection = facial_landmarks_detection
+        self.head_pose_estimation = head_pose_estimation
+        self.gaze_estimation = gaze_estimation
+        self.batch_size = batch_size
+        self.mirror = mirror
+        # total time spent in each stage
+        self.stage_times = {'face_detection_time': 0.0, 'landmarks_time': 0.0, 'head_pose_time': 0.0, 'gaze_time': 0.0}
+
+    def run(self, feed, writer):
+        '''
+        Process all the frames of the feed, write the results and return the run statistics.
+        The feed must keep batch_size frames valid (hold_frames).
+        '''
+        start_time = time.time()
+        frames_count = 0
+        frames = []
+        for frame in feed.next_batch():
+            frames.append(frame)
+            if len(frames) == self.batch_size:
+                self.write(writer, self.process(frames, frames_count), feed.paths)
+                frames_count += len(frames)
+                frames = []
+        if frames:
+            self.write(writer, self.process(frames, frames_count), feed.paths)
+            frames_count += len(frames)
+        elapsed = time.time() - start_time
+        stats = {'frames': frames_count, 'batch_size': self.batch_size, 'total_time': elapsed,
+                 'frames_per_second': frames_count / elapsed if elapsed > 0 else 0.0}
+        stats.update(self.stage_times)
+        return stats
+
+    def write(self, writer, results, paths=None):
+        for result, times in results:
+            row = result_row(result, times)
+            if paths:
+                row['path'] = paths[result.frame_index]
+            writer.write(row)
+
+    def process(self, frames, first_index):
+        '''
+        Run the four stages on a batch of frames, and return the list of (Frame_Result, per stage times).
+        The per stage times of a frame are its share of the batch inference times.
+        '''
+        results = [Frame_Result(first_index + index, frame, self.mirror) for index, frame in enumerate(frames)]
+        times = {}
+
+        start = time.time()
+        coords = self.face_detection.predict_batch(frames, self.mirror)
+        times['face_detection_time'] = time.time() - start
+        for result, face_coords in zip(results, coords):
+            result.face_box = self.face_detection.get_face_box(result.frame, face_coords)
+            result.face_detected = True
+
+        faces = [result for result in results if result.face_box is not None]
+        if faces:
+            images = [result.frame for result in faces]
+            boxes = [result.face_box for result in faces]
+
+            start = time.time()
+            landmarks = self.facial_landmarks_detection.predict_batch(images, boxes, self.mirror)
+            times['landmarks_time'] = time.time() - start
+            start = time.time()
+            head_pose_angles = self.head_pose_estimation.predict_batch(images, boxes, self.mirror)
+            times['head_pose_time'] = time.time() - start
+            for index, result in enumerate(faces):
+                result.left_eye_box, result.right_eye_box, result.landmarks = landmarks[index]
+                result.head_pose_angles = head_pose_angles[index]
+
+            start = time.time()
+            gaze_vectors = self.gaze_estimation.predict_batch(images, [result.left_eye_box for result in faces],
+                                                              [result.right_eye_box for result in faces],
+                                                              head_pose_angles, self.mirror)
+            times['gaze_time'] = time.time() - start
+            for index, result in enumerate(faces):
+                result.gaze_vector = gaze_vectors[index]
+
+        for stage, stage_time in times.items():
+            self.stage_times[stage] += stage_time
+        frame_times = {stage: stage_time / len(frames) for stage, stage_time in times.items()}
+        return [(result, frame_times) for result in results]
@@ -0,0 +1,179 @@
+'''
+This class aggregates the per-layer performance counters of the models, with a low overhead.
+
+The counters of an infer request are only read on one inference out of sample_interval of each model, and
+summed in memory per model and per layer. They are exported :
+- periodically, as a rolling JSON snapshot file (rewritten every snapshot_interval seconds),
+- on request, as Prometheus text on http://127.0.0.1:<port>/metrics,
+- at the end of the run, as a report of the hottest layers of each model.
+
+Sample usage:
+    perf_counters = Perf_Counters(sample_interval=100, snapshot_file='perf_counts.json', port=9100)
+    face_detection = Face_Detection(model_name, perf_counters=perf_counters)
+    ...
+    perf_counters.report(10)
+    perf_counters.close()
+'''
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# the counters are only measured by the plugin when asked for at load time
+CONFIG = {'PERF_COUNT': 'YES'}
+SAMPLE_INTERVAL = 100
+SNAPSHOT_INTERVAL = 10.0
+
+
+class Perf_Counters:
+    def __init__(self, sample_interval=SAMPLE_INTERVAL, snapshot_file=None, snapshot_interval=SNAPSHOT_INTERVAL,
+                 port=None):
+        self.sample_interval = max(1, sample_interval)
+        self.snapshot_file = snapshot_file
+        self.snapshot_interval = snapshot_interval
+        self.config = CONFIG
+        self.lock = threading.Lock()
+        # per model : number of inferences, number of sampled inferences and total time (microseconds) of the samples
+        self.models = {}
+        # per model, per layer : layer type, execution type, number of samples, total real and cpu times (microseconds)
+        self.layers = {}
+        self.last_snapshot_time = time.time()
+        self.server = None
+        if port is not None:
+            self.serve(port)
+
+    def record(self, model, request):
+        '''
+        Count an inference of the model that has just completed on the infer request, and aggregate the performance
+        counters of the request if the inference is sampled.
+        '''
+        with self.lock:
+            totals = self.models.setdefault(model, {'inferences': 0, 'samples': 0, 'real_time': 0, 'cpu_time': 0})
+            totals['inferences'] += 1
+            if (totals['inferences'] - 1) % self.sample_interval != 0:
+                return
+        # read outside of the lock, as it may take some time
+        counts = request.get_perf_counts()
+        with self.lock:
+            totals['samples'] += 1
+            layers = self.layers.setdefault(model, {})
+            for name, layer in counts.items():
+                if layer['status'] != 'EXECUTED':
+                    continue
+                totals['real_time'] += layer['real_time']
+                totals['cpu_time'] += layer['cpu_time']
+                aggregate = layers.get(name)
+                if aggregate is None:
+                    aggregate = layers[name] = {'layer_type': layer['layer_type'], 'exec_type': layer['exec_type'],
+                                                'samples': 0, 'real_time': 0, 'cpu_time': 0}
+                aggregate['samples'] += 1
+                aggregate['real_time'] += layer['real_time']
+                aggregate['cpu_time'] += layer['cpu_time']
+            snapshot_due = self.snapshot_file is not None and \
+                time.time() - self.last_snapshot_time >= self.snapshot_interval
+            if snapshot_due:
+                self.last_snapshot_time = time.time()
+        if snapshot_due:
+            self.write_snapshot()
+
+    def snapshot(self):
+        '''
+        Return a copy of the aggregated counters.
+        '''
+        with self.lock:
+            return {'time': time.time(), 'sample_interval': self.sample_interval,
+                    'models': {model: dict(totals) for model, totals in self.models.items()},
+                    'layers': {model: {name: dict(layer) for name, layer in layers.items()}
+                               for model, layers in self.layers.items()}}
+
+    def write_snapshot(self):
+        '''
+        Replace the snapshot file by the current counters.
+        '''
+        # write to a temporary file first, so that a reader never sees a partial snapshot
+        with open(self.snapshot_file + '.tmp', 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(self.snapshot_file + '.tmp', self.snapshot_file)
+
+    def top_layers(self, model, count=10):
+        '''
+        Return the count layers of the model with the highest average real time, as a list of (name, layer counters).
+        '''
+        with self.lock:
+            layers = list(self.layers.get(model, {}).items())
+        layers.sort(key=lambda item: item[1]['real_time'] / item[1]['samples'], reverse=True)
+        return layers[:count]
+
+    def prometheus_text(self):
+        '''
+        Return the counters in the Prometheus text exposition format.
+        '''
+        snapshot = self.snapshot()
+        lines = ['# TYPE perf_inferences_total counter', '# TYPE perf_samples_total counter',
+                 '# TYPE perf_model_real_time_microseconds_total counter',
+                 '# TYPE perf_layer_real_time_microseconds_total counter',
+                 '# TYPE perf_layer_cpu_time_microseconds_total counter']
+        for model, totals in snapshot['models'].items():
+            lines.append('perf_inferences_total{{model="{}"}} {}'.format(model, totals['inferences']))
+            lines.append('perf_samples_total{{model="{}"}} {}'.format(model, totals['samples']))
+            lines.append('perf_model_real_time_microseconds_total{{model="{}"}} {}'.format(model, totals['real_time']))
+        for model, layers in snapshot['layers'].items():
+            for name, layer in layers.items():
+                labels = 'model="{}",layer="{}",layer_type="{}",exec_type="{}"'.format(
+                    model, name.replace('"', '\\"'), layer['layer_type'], layer['exec_type'])
+                lines.append('perf_layer_real_time_microseconds_total{{{}}} {}'.format(labels, layer['real_time']))
+                lines.append('perf_layer_cpu_time_microseconds_total{{{}}} {}'.format(labels, layer['cpu_time']))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port):
+        '''
+        Serve the Prometheus text on the local port, from a background thread.
+        '''
+        perf_counters = self
+
+        class Metrics_Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = perf_counters.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # no console output for each scrape
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', port), Metrics_Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def report(self, count=10):
+        '''
+        Print the count hottest layers of each model, with the average time of each model.
+        '''
+        snapshot = self.snapshot()
+        for model, totals in snapshot['models'].items():
+            if totals['samples'] == 0:
+                continue
+            print("Performance counters of", model, ":", totals['samples'], "inferences sampled out of",
+                  totals['inferences'], "/ average {:.3f} ms".format(totals['real_time'] / totals['samples'] / 1000))
+            for name, layer in self.top_layers(model, count):
+                average = layer['real_time'] / layer['samples']
+                print("    {:<50} {:<20} {:<20} {:8.3f} ms {:5.1f}%".format(
+                    name, layer['layer_type'], layer['exec_type'], average / 1000,
+                    100 * layer['real_time'] / max(totals['real_time'], 1)))
+
+    def close(self):
+        '''
+        Write the last snapshot and stop the server.
+        '''
+        if self.snapshot_file is not None:
+            self.write_snapshot()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,307 @@
+'''
+These are the classes chaining the four models (face detection, facial landmarks, head pose and gaze estimation)
+on each frame.
+
+Both pipelines share the same interface :
+    pipeline = Async_Pipeline(face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation)
+    for frame in feed.next_batch():
+        for result in pipeline.submit(frame):
+            do_something(result)
+    for result in pipeline.flush():
+        do_something(result)
+
+Results are always returned in the order the frames were submitted. As the frames are not copied,
+they must stay valid until their result is returned.
+
+With mirror set, the models work on the mirrored frames (as the webcam acts as a mirror) without flipping them :
+the boxes are expressed in the coordinates of the mirrored frame.
+
+With a Face_Tracker, the face detection only runs on some frames : on the other ones, the face region
+is the one tracked from the landmarks of the previous frame. If the tracking is lost on a frame,
+the face detection runs on that frame before going on.
+
+With a Motion_Gate, the three other models are skipped on the frames where the face and the eyes did not change,
+the results of a previous frame being reused.
+
+The Multi_Face_Pipeline carries all the faces found through the three other models, and a Face_Selector
+chooses the face whose results are those of the frame.
+'''
+import time
+from collections import deque
+
+from preprocessing import crop
+
+
+class Frame_Result:
+    '''
+    Outputs of the four models for one frame. face_box is None if no face was found in the frame,
+    gaze_vector is None if the pipeline could not go up to the gaze estimation.
+    '''
+    def __init__(self, frame_index, frame, mirror=False):
+        self.frame_index = frame_index
+        self.frame = frame
+        self.mirror = mirror
+        # box (x, y, w, h) of the face in the frame, and whether it comes from a face detection or the tracking
+        self.face_box = None
+        self.face_detected = False
+        # positions of the five facial landmarks in the face, and boxes of the eyes in the frame
+        self.landmarks = None
+        self.left_eye_box = None
+        self.right_eye_box = None
+        self.head_pose_angles = None
+        self.gaze_vector = None
+        # whether the landmarks, head pose angles and gaze vector are those of a previous frame (see Motion_Gate)
+        self.reused = False
+        # with the Multi_Face_Pipeline, the results of each face found in the frame
+        self.faces = []
+        # time when the frame was submitted to the pipeline
+        self.start_time = time.time()
+        # inference time of the face detection, and time from the submission until the face was found
+        # (with the asynchronous pipeline, the latency includes the time the frame waited behind other frames)
+        self.face_detection_time = None
+        self.face_detection_latency = None
+        self.inference_time = None
+        # time spent in each stage ('face_detection', 'landmarks', 'head_pose', 'gaze') that ran on this frame
+        self.stage_times = {}
+
+    def face_image(self):
+        '''
+        Return a copy of the face found in the (mirrored) frame, or None if no face was found.
+        '''
+        if self.face_box is None:
+            return None
+        return crop(self.frame, self.face_box, self.mirror)
+
+
+class Serial_Pipeline:
+    '''
+    Run the four models one after another on each frame, a single model being busy at a time.
+    '''
+    def __init__(self, face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation, tracker=None,
+                 mirror=False, gate=None):
+        self.face_detection = face_detection
+        self.facial_landmarks_detection = facial_landmarks_detection
+        self.head_pose_estimation = head_pose_estimation
+        self.gaze_estimation = gaze_estimation
+        self.tracker = tracker
+        self.mirror = mirror
+        self.gate = gate
+        self.frame_index = 0
+
+    def submit(self, frame):
+        '''
+        Process the frame and return a list with its result.
+        '''
+        result = Frame_Result(self.frame_index, frame, self.mirror)
+        self.frame_index += 1
+        tracked = self.tracker is not None and not self.tracker.needs_detection()
+        if tracked:
+            result.face_box = self.tracker.tracked_roi()
+        else:
+            self.detect_face(result)
+        return [self.process(result, tracked)]
+
+    def flush(self):
+        '''
+        Nothing is pending in a serial pipeline.
+        '''
+        return []
+
+    def detect_face(self, result, request_id=0):
+        '''
+        Run the face detection on the frame of the result.
+        '''
+        start = time.time()
+        self.face_detection.start_async(result.frame, request_id, self.mirror)
+        self.set_detected_face(result, self.face_detection.wait(request_id))
+        result.stage_times['face_detection'] = time.time() - start
+
+    def set_detected_face(self, result, coords):
+        '''
+        Set the face box of the result from the coordinates returned by the face detection.
+        '''
+        result.face_box = self.face_detection.get_face_box(result.frame, coords)
+        result.face_detected = True
+        if self.tracker is not None:
+            self.tracker.set_detection(result.face_box)
+
+    def process(self, result, tracked, request_id=0):
+        '''
+        Run the three other models on the face found in the frame.
+        '''
+        if result.face_box is None:
+            return result
+        result.face_detection_time = result.stage_times.get('face_detection')
+        result.face_detection_latency = time.time() - result.start_time
+        if self.gate is not None and self.gate.reuse(result):
+            # the face did not change : its tracked ROI is still valid
+            result.inference_time = time.time() - result.start_time
+            return result
+        self.estimate(result)
+        if self.tracker is not None and result.landmarks is not None:
+            if not self.tracker.update(result.face_box, result.landmarks) and tracked:
+                # the tracking was lost : detect the face on this frame and start again
+                self.detect_face(result, request_id)
+                return self.process(result, False, request_id)
+        if result.left_eye_box is None or result.right_eye_box is None or result.head_pose_angles is None:
+            return result
+        start = time.time()
+        self.gaze_estimation.start_async(result.frame, result.left_eye_box, result.right_eye_box, result.head_pose_angles,
+                                         mirror=self.mirror)
+        result.gaze_vector = self.gaze_estimation.wait()
+        result.stage_times['gaze'] = time.time() - start
+        result.inference_time = time.time() - result.start_time
+        if self.gate is not None:
+            self.gate.set_reference(result)
+        return result
+
+    def estimate(self, result):
+        '''
+        Run the facial landmarks detection, then the head pose estimation on the face.
+        '''
+        start = time.time()
+        result.left_eye_box, result.right_eye_box, result.landmarks = \
+            self.facial_landmarks_detection.predict(result.frame, result.face_box, self.mirror)
+        result.stage_times['landmarks'] = time.time() - start
+        if result.left_eye_box is None or result.right_eye_box is None:
+            return
+        start = time.time()
+        result.head_pose_angles = self.head_pose_estimation.predict(result.frame, result.face_box, self.mirror)
+        result.stage_times['head_pose'] = time.time() - start
+
+
+class Async_Pipeline(Serial_Pipeline):
+    '''
+    Run the four models with asynchronous infer requests :
+    - the face detection of the next frames is running while the other models process the current frame,
+    - the facial landmarks detection and the head pose estimation run at the same time, as both only need the face.
+
+    The face detection model must have been loaded with num_requests infer requests (at least 2).
+    '''
+    def __init__(self, face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation, num_requests=2,
+                 tracker=None, mirror=False, gate=None):
+        if num_requests < 2:
+            raise ValueError("The asynchronous pipeline needs at least 2 infer requests for the face detection.")
+        super().__init__(face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation, tracker, mirror,
+                         gate)
+        self.num_requests = num_requests
+        # frames whose face detection is running, in submission order : (result, request_id, tracked)
+        self.in_flight = deque()
+
+    def submit(self, frame):
+        '''
+        Start the face detection on the frame, and return the results of the oldest frames
+        when all the face detection infer requests are busy.
+        '''
+        result = Frame_Result(self.frame_index, frame, self.mirror)
+        request_id = self.frame_index % self.num_requests
+        self.frame_index += 1
+        tracked = self.tracker is not None and not self.tracker.needs_detection()
+        if not tracked:
+            self.face_detection.start_async(frame, request_id, self.mirror)
+        self.in_flight.append((result, request_id, tracked))
+        results = []
+        # the tracked frames do not wait for a face detection : they finish as soon as no frame is ahead of them
+        while self.in_flight and (len(self.in_flight) >= self.num_requests or self.in_flight[0][2]):
+            results.append(self.finish(*self.in_flight.popleft()))
+        return results
+
+    def flush(self):
+        '''
+        Wait for all the pending frames and return their results.
+        '''
+        results = []
+        while self.in_flight:
+            results.append(self.finish(*self.in_flight.popleft()))
+        return results
+
+    def finish(self, result, request_id, tracked):
+        '''
+        Wait for the face detection of a frame (or take the tracked face), then run the three other models on the face.
+        '''
+        if tracked and not self.tracker.can_track():
+            # the tracking was lost on a previous frame, after this one was submitted
+            tracked = False
+            self.detect_face(result, request_id)
+        elif tracked:
+            result.face_box = self.tracker.tracked_roi()
+        else:
+            self.set_detected_face(result, self.face_detection.wait(request_id))
+            # measured by the infer request, without the time the frame waited behind the previous frames
+            result.stage_times['face_detection'] = self.face_detection.request_latency(request_id)
+        return self.process(result, tracked, request_id)
+
+    def estimate(self, result):
+        '''
+        Run the facial landmarks detection and the head pose estimation at the same time, as both only need the face.
+        '''
+        start = time.time()
+        self.facial_landmarks_detection.start_async(result.frame, result.face_box, mirror=self.mirror)
+        self.head_pose_estimation.start_async(result.frame, result.face_box, mirror=self.mirror)
+        result.left_eye_box, result.right_eye_box, result.landmarks = self.facial_landmarks_detection.wait(result.face_box)
+        result.stage_times['landmarks'] = time.time() - start
+        result.head_pose_angles = self.head_pose_estimation.wait()
+        result.stage_times['head_pose'] = time.time() - start
+
+
+class Multi_Face_Pipeline(Serial_Pipeline):
+    '''
+    Run the three other models on all the faces found in each frame (at most max_faces), as one batch per stage.
+    The results of the frame are those of the face chosen by the selector, result.faces holding the results of each face.
+
+    The facial landmarks detection, head pose estimation and gaze estimation models must have been loaded
+    with a batch size of max_faces.
+    '''
+    def __init__(self, face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation, selector,
+                 max_faces, mirror=False):
+        super().__init__(face_detection, facial_landmarks_detection, head_pose_estimation, gaze_estimation, None, mirror)
+        self.selector = selector
+        self.max_faces = max_faces
+
+    def submit(self, frame):
+        '''
+        Process the frame and return a list with its result.
+        '''
+        result = Frame_Result(self.frame_index, frame, self.mirror)
+        self.frame_index += 1
+        self.face_detection.start_async(frame, 0, self.mirror)
+        boxes = self.face_detection.get_face_boxes(frame, self.face_detection.wait())[:self.max_faces]
+        result.face_detected = True
+        result.stage_times['face_detection'] = time.time() - result.start_time
+        selected = self.selector.select(boxes, frame.shape)
+        if selected is None:
+            return [result]
+        result.face_detection_time = result.stage_times['face_detection']
+        result.face_detection_latency = time.time() - result.start_time
+
+        images = [frame] * len(boxes)
+        start = time.time()
+        landmarks = self.facial_landmarks_detection.predict_batch(images, boxes, self.mirror)
+        result.stage_times['landmarks'] = time.time() - start
+        start = time.time()
+        head_pose_angles = self.head_pose_estimation.predict_batch(images, boxes, self.mirror)
+        result.stage_times['head_pose'] = time.time() - start
+        for box, face_landmarks, face_head_pose_angles in zip(boxes, landmarks, head_pose_angles):
+            face = Frame_Result(result.frame_index, frame, self.mirror)
+            face.face_box = box
+            face.face_detected = True
+            face.left_eye_box, face.right_eye_box, face.landmarks = face_landmarks
+            face.head_pose_angles = face_head_pose_angles
+            result.faces.append(face)
+        start = time.time()
+        gaze_vectors = self.gaze_estimation.predict_batch(images, [face.left_eye_box for face in result.faces],
+                                                          [face.right_eye_box for face in result.faces],
+                                                          head_pose_angles, self.mirror)
+        result.stage_times['gaze'] = time.time() - start
+        for face, gaze_vector in zip(result.faces, gaze_vectors):
+            face.gaze_vector = gaze_vector
+
+        chosen = result.faces[selected]
+        result.face_box = chosen.face_box
+        result.landmarks = chosen.landmarks
+        result.left_eye_box = chosen.left_eye_box
+        result.right_eye_box = chosen.right_eye_box
+        result.head_pose_angles = chosen.head_pose_angles
+        result.gaze_vector = chosen.gaze_vector
+        result.inference_time = time.time() - result.start_time
+        return [result]
@@ -0,0 +1,86 @@
+'''
+This is the preprocessing shared by the four models.
+
+Each model owns an Input_Buffer : a preallocated NCHW input tensor written in place on every inference.
+A region of the source frame is warped directly to the model input size in a single cv2.warpAffine call
+(or a cv2.resize of a view of the frame when the region is made of whole pixels inside the frame),
+so the face and eyes are never cropped and then resized in two steps.
+
+The webcam acts as a mirror, but the frame is never flipped : the boxes are expressed in the coordinates of
+the mirrored frame, and the mirror is folded into the affine transform from the model input to the source frame.
+'''
+import cv2
+import numpy as np
+
+
+def region_matrix(box, size, frame_width, mirror=False):
+    '''
+    Return the affine matrix mapping a pixel of an image of size (width, height) to the source frame pixel,
+    the image covering the box (x, y, w, h) of the (mirrored if mirror is set) frame.
+    '''
+    x, y, w, h = box
+    scale_x = w / size[0]
+    scale_y = h / size[1]
+    # pixel centers are at .5 coordinates
+    offset_x = x + 0.5 * scale_x - 0.5
+    offset_y = y + 0.5 * scale_y - 0.5
+    if mirror:
+        return np.array([[-scale_x, 0, frame_width - 1 - offset_x], [0, scale_y, offset_y]], dtype=np.float32)
+    return np.array([[scale_x, 0, offset_x], [0, scale_y, offset_y]], dtype=np.float32)
+
+
+def warp_region(frame, box, size, mirror=False, dst=None):
+    '''
+    Return the box (x, y, w, h) of the (mirrored if mirror is set) frame, resized to size (width, height).
+    '''
+    x, y, w, h = box
+    frame_height, frame_width = frame.shape[:2]
+    if all(float(value).is_integer() for value in box) and x >= 0 and y >= 0 and x + w <= frame_width and y + h <= frame_height:
+        # faster path for a box of whole pixels inside the frame : resize a view of the frame, then flip the small image
+        x, y, w, h = int(x), int(y), int(w), int(h)
+        if mirror:
+            x = frame_width - x - w
+        dst = cv2.resize(frame[y:y + h, x:x + w], size, dst=dst, interpolation=cv2.INTER_LINEAR)
+        if mirror:
+            cv2.flip(dst, 1, dst=dst)
+        return dst
+    matrix = region_matrix(box, size, frame.shape[1], mirror)
+    return cv2.warpAffine(frame, matrix, size, dst=dst, flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+
+def crop(frame, box, mirror=False):
+    '''
+    Return a copy of the part of the (mirrored if mirror is set) frame inside the box (x, y, w, h)
+    '''
+    return warp_region(frame, box, (int(box[2]), int(box[3])), mirror)
+
+
+def full_frame(frame):
+    '''
+    Return the box covering the whole frame.
+    '''
+    return 0, 0, frame.shape[1], frame.shape[0]
+
+
+class Input_Buffer:
+    '''
+    Preallocated NCHW input tensor of a model, with the HWC image used as the warp destination.
+    '''
+    def __init__(self, shape, dtype=np.float32):
+        self.tensor = np.zeros(shape, dtype=dtype)
+        self.size = (shape[3], shape[2])
+        self.image = np.empty((shape[2], shape[3], shape[1]), dtype=np.uint8)
+        # the channels are split to contiguous planes before the conversion, faster than a strided copy
+        self.planes = np.empty((shape[1], shape[2], shape[3]), dtype=np.uint8)
+        self.plane_views = list(self.planes)
+
+    def write(self, frame, box, mirror=False, index=0):
+        '''
+        Warp the box of the frame to the model input size, and write it in the tensor at the batch index.
+        Return the tensor.
+        '''
+        warp_region(frame, box, self.size, mirror, dst=self.image)
+        cv2.split(self.image, self.plane_views)
+        np.copyto(self.tensor[index], self.planes)
+        return self.tensor
@@ -0,0 +1,206 @@
+'''
+This class keeps the latency of the frames within a budget, by changing at runtime :
+- how often the face detection runs (the redetect_interval of the Face_Tracker, the face being tracked in between),
+  from the configured interval up to 8 times less often,
+- the input resolution of the face detection (a scale of its original input size),
+- how often the motion gate lets the facial landmarks detection, head pose estimation and gaze estimation run
+  (its threshold and refresh_interval, from their configured values), when the gate is used,
+- the frame_skip of the InputFeeder (with the 'nth' policy).
+
+The latency of a frame is the time from its submission to the pipeline to the use of its result. Every window frames,
+the p95 latency of the window is compared to the budget (target_latency, or 1 / target_fps) :
+- above the budget, the cost of each frame is lowered where the time goes : each stage has a share of the budget
+  (stage_shares), and the stages whose p95 time is above their share are degraded first, the one furthest above its
+  share first. The face detection runs less often, then on a smaller input. The three other stages are skipped on more
+  frames by the motion gate. When no stage is above its share (the frames wait in the pipeline) or the stages above
+  their share have nothing left to degrade, the face detection, the most expensive stage, is degraded,
+- when frames were dropped because we are late on the camera, more frames are skipped (the skipped frames are not
+  decoded, which leaves more CPU time to the models),
+- below low_ratio times the budget, the quality comes back in the reverse order : fewer frames are skipped first
+  (on a fast machine, the frames are not wasted), then the motion gate comes back to its settings, then the face
+  detection input grows back, then it runs as often as configured.
+After each decision, the next one waits for a full window measured with the new settings.
+Each decision is printed with its reason, and kept in decisions.
+
+The face detection network is only reshaped between frames : the controller sets pending_scale, and the caller
+flushes its pipeline before calling apply_scale.
+'''
+import time
+
+import numpy as np
+
+WINDOW = 15
+LOW_RATIO = 0.6
+# factors of the configured face detection interval
+DETECTION_INTERVAL_FACTORS = [1, 2, 4, 8]
+DETECTION_SCALES = [1.0, 0.75, 0.5]
+# factors of the configured threshold and refresh interval of the motion gate
+GATE_FACTORS = [(1.0, 1), (1.5, 2), (2.0, 4)]
+MAX_FRAME_SKIP = 30
+# share of the budget of each stage
+STAGE_SHARES = {'face_detection': 0.5, 'landmarks': 0.15, 'head_pose': 0.15, 'gaze': 0.2}
+
+
+def check_targets(target_latency, target_fps):
+    if target_latency is None and target_fps is None:
+        raise ValueError("The adaptive QoS needs a target latency or a target FPS.")
+
+
+class QoS_Controller:
+    def __init__(self, target_latency=None, target_fps=None, feed=None, tracker=None, face_detection=None, gate=None,
+                 window=WINDOW, low_ratio=LOW_RATIO, max_frame_skip=MAX_FRAME_SKIP, stage_shares=STAGE_SHARES):
+        check_targets(target_latency, target_fps)
+        self.budget = target_latency if target_latency is not None else 1.0 / target_fps
+        self.feed = feed
+        self.tracker = tracker
+        self.face_detection = face_detection
+        self.gate = gate
+        self.window = window
+        self.low_ratio = low_ratio
+        self.max_frame_skip = max_frame_skip
+        self.stage_shares = stage_shares
+        # the frame skip is only a knob with the 'nth' policy of a capture thread
+        self.min_frame_skip = 1
+        self.adjust_frame_skip = feed is not None and feed.policy == 'nth' and feed.input_type in ('cam', 'video')
+        self.interval_level = 0
+        self.scale_level = 0
+        self.gate_level = 0
+        self.pending_scale = None
+        # the configured settings are the best quality the controller comes back to
+        self.detection_intervals = []
+        if tracker is not None:
+            self.detection_intervals = [tracker.redetect_interval * factor for factor in DETECTION_INTERVAL_FACTORS]
+        self.gate_settings = []
+        if gate is not None:
+            self.gate_settings = [(gate.threshold * threshold_factor, gate.refresh_interval * refresh_factor)
+                                  for threshold_factor, refresh_factor in GATE_FACTORS]
+        self.latencies = []
+        self.stage_times = {stage: [] for stage in stage_shares}
+        self.dropped = feed.frames_dropped if feed is not None else 0
+        self.decisions = []
+
+    def observe(self, result):
+        '''
+        Record the latency of a frame whose result was just used, and take a decision at the end of each window.
+        '''
+        self.latencies.append(time.time() - result.start_time)
+        for stage, stage_time in result.stage_times.items():
+            if stage in self.stage_times:
+                self.stage_times[stage].append(stage_time)
+        if len(self.latencies) < self.window or self.pending_scale is not None:
+            return
+        p95 = float(np.percentile(self.latencies, 95))
+        dropped = self.feed.frames_dropped - self.dropped if self.feed is not None else 0
+        if p95 > self.budget:
+            reason = "p95 latency {:.1f} ms above the budget of {:.1f} ms".format(p95 * 1000, self.budget * 1000)
+            self.degrade(reason, self.stages_over_share())
+        elif dropped > 0 and self.adjust_frame_skip and self.feed.frame_skip < self.max_frame_skip:
+            self.set_frame_skip(self.feed.frame_skip + 1, "{} frames dropped by the capture".format(dropped))
+        elif p95 < self.low_ratio * self.budget:
+            self.upgrade("p95 latency {:.1f} ms below {:.0f}% of the budget of {:.1f} ms".format(
+                p95 * 1000, self.low_ratio * 100, self.budget * 1000))
+        # the next decision is taken on a window measured with the new settings
+        self.latencies = []
+        self.stage_times = {stage: [] for stage in self.stage_shares}
+        if self.feed is not None:
+            self.dropped = self.feed.frames_dropped
+
+    def stages_over_share(self):
+        '''
+        Return the stages whose p95 time of the window is above their share of the budget, with their p95 time,
+        the furthest above their share first.
+        '''
+        stages = []
+        for stage, times in self.stage_times.items():
+            if times:
+                p95 = float(np.percentile(times, 95))
+                if p95 > self.stage_shares[stage] * self.budget:
+                    stages.append((stage, p95))
+        return sorted(stages, key=lambda stage: stage[1] / self.stage_shares[stage[0]], reverse=True)
+
+    def degrade(self, reason, stages=()):
+        for stage, p95 in stages:
+            stage_reason = "{} ({} p95 {:.1f} ms above its share of {:.1f} ms)".format(
+                reason, stage, p95 * 1000, self.stage_shares[stage] * self.budget * 1000)
+            if stage == 'face_detection':
+                if self.degrade_face_detection(stage_reason):
+                    return
+            elif self.degrade_gate(stage_reason):
+                return
+        # the frames wait in the pipeline, or the stages above their share can not be degraded anymore
+        self.degrade_face_detection(reason)
+
+    def degrade_face_detection(self, reason):
+        if self.tracker is not None and self.interval_level < len(self.detection_intervals) - 1:
+            self.interval_level += 1
+            self.set_interval(reason)
+        elif self.face_detection is not None and self.scale_level < len(DETECTION_SCALES) - 1:
+            self.scale_level += 1
+            self.request_scale(reason)
+        else:
+            return False
+        return True
+
+    def degrade_gate(self, reason):
+        if self.gate_level >= len(self.gate_settings) - 1:
+            return False
+        self.gate_level += 1
+        self.set_gate(reason)
+        return True
+
+    def upgrade(self, reason):
+        if self.adjust_frame_skip and self.feed.frame_skip > self.min_frame_skip:
+            self.set_frame_skip(self.feed.frame_skip - 1, reason)
+        elif self.gate_level > 0:
+            self.gate_level -= 1
+            self.set_gate(reason)
+        elif self.scale_level > 0:
+            self.scale_level -= 1
+            self.request_scale(reason)
+        elif self.interval_level > 0:
+            self.interval_level -= 1
+            self.set_interval(reason)
+
+    def set_interval(self, reason):
+        interval = self.detection_intervals[self.interval_level]
+        self.log(reason, "face detection interval", self.tracker.redetect_interval, interval)
+        self.tracker.redetect_interval = interval
+
+    def set_gate(self, reason):
+        threshold, refresh_interval = self.gate_settings[self.gate_level]
+        self.log(reason, "motion gate threshold and refresh interval",
+                 (self.gate.threshold, self.gate.refresh_interval), (threshold, refresh_interval))
+        self.gate.threshold = threshold
+        self.gate.refresh_interval = refresh_interval
+
+    def set_frame_skip(self, frame_skip, reason):
+        self.log(reason, "frame skip", self.feed.frame_skip, frame_skip)
+        self.feed.frame_skip = frame_skip
+
+    def request_scale(self, reason):
+        self.pending_scale = DETECTION_SCALES[self.scale_level]
+        self.log(reason, "face detection input scale", self.face_detection.input_scale, self.pending_scale)
+
+    def apply_scale(self):
+        '''
+        Reshape the face detection network to the pending scale. The pipeline must have been flushed.
+        '''
+        self.face_detection.set_input_scale(self.pending_scale)
+        self.pending_scale = None
+
+    def log(self, reason, setting, old_value, new_value):
+        self.decisions.append((time.time(), reason, setting, old_value, new_value))
+        print("QoS :", reason, ":", setting, old_value, "->", new_value)
+
+    def stats(self):
+        '''
+        Return the QoS statistics as a dict.
+        '''
+        return {
+            'budget': self.budget,
+            'decisions': len(self.decisions),
+            'face_detection_interval': self.tracker.redetect_interval if self.tracker is not None else 1,
+            'face_detection_scale': DETECTION_SCALES[self.scale_level],
+            'motion_gate': (self.gate.threshold, self.gate.refresh_interval) if self.gate is not None else None,
+            'frame_skip': self.feed.frame_skip if self.feed is not None else None
+        }
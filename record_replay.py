@@ -0,0 +1,227 @@
+'''
+These are the classes to record the frames (and optionally the outputs of the models) of a run, and replay them.
+
+A recording is a directory holding :
+- frames.raw : the raw frames, one after another, read back as a memory-mapped array (without copy nor decoding),
+- meta.json : the shape and dtype of the frames,
+- timestamps.npy : the time of each frame since the first one, to replay them at their native rate,
+- outputs.npz : with the outputs recorded, the face box, landmarks, eyes boxes, head pose angles and gaze vector
+  of each frame (NaN when they were not found).
+
+The replayed frames come from the 'replay' input_type of the InputFeeder. The Replayed_* classes have the interface
+of the model classes but return the recorded outputs of the replayed frame, so they can stand in for any stage :
+the downstream stages or the mouse controller can then be benchmarked on their own.
+
+Sample usage:
+    recorder = Recorder('recording', record_outputs=True)
+    recorder.write(result)
+    recorder.close()
+
+    replay = Replay('recording')
+    feed = InputFeeder('replay', 'recording', replay=replay)
+    face_detection = Replayed_Face_Detection(replay)
+'''
+import json
+import os
+import time
+
+import numpy as np
+
+from preprocessing import crop
+
+FRAMES_FILE = 'frames.raw'
+META_FILE = 'meta.json'
+TIMESTAMPS_FILE = 'timestamps.npy'
+OUTPUTS_FILE = 'outputs.npz'
+# recorded outputs and their shape for one frame
+OUTPUTS = {'face_box': (4,), 'landmarks': (5, 2), 'left_eye_box': (4,), 'right_eye_box': (4,),
+           'head_pose_angles': (3,), 'gaze_vector': (3,)}
+
+
+class Recorder:
+    def __init__(self, directory, record_outputs=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.record_outputs = record_outputs
+        self.frames_file = open(os.path.join(directory, FRAMES_FILE), 'wb')
+        self.start_time = None
+        self.timestamps = []
+        self.outputs = {name: [] for name in OUTPUTS}
+
+    def write(self, result):
+        '''
+        Append the frame of a Frame_Result, and its outputs if they are recorded.
+        '''
+        frame = result.frame
+        if self.start_time is None:
+            self.start_time = result.start_time
+            # written with the first frame, so that the frames can be replayed even if the recording is not closed
+            with open(os.path.join(self.directory, META_FILE), 'w') as meta:
+                json.dump({'shape': list(frame.shape), 'dtype': str(frame.dtype)}, meta)
+        self.frames_file.write(np.ascontiguousarray(frame).data)
+        self.timestamps.append(result.start_time - self.start_time)
+        if self.record_outputs:
+            for name, shape in OUTPUTS.items():
+                value = getattr(result, name)
+                self.outputs[name].append(np.full(shape, np.nan) if value is None else np.reshape(value, shape))
+
+    def close(self):
+        self.frames_file.close()
+        np.save(os.path.join(self.directory, TIMESTAMPS_FILE), np.array(self.timestamps))
+        if self.record_outputs:
+            np.savez(os.path.join(self.directory, OUTPUTS_FILE),
+                     **{name: np.array(values, dtype=np.float64).reshape((-1,) + OUTPUTS[name])
+                        for name, values in self.outputs.items()})
+
+
+class Replay:
+    '''
+    Recording opened for replay. The frames are read-only views of the memory-mapped frames file.
+    '''
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILE)) as meta_file:
+            meta = json.load(meta_file)
+        shape = tuple(meta['shape'])
+        dtype = np.dtype(meta['dtype'])
+        path = os.path.join(directory, FRAMES_FILE)
+        # the count comes from the file size, in case the recording was not closed
+        count = os.path.getsize(path) // (int(np.prod(shape)) * dtype.itemsize)
+        if count == 0:
+            raise ValueError("The recording " + directory + " has no frame.")
+        self.frames = np.memmap(path, dtype=dtype, mode='r', shape=(count,) + shape)
+        self.timestamps = None
+        if os.path.exists(os.path.join(directory, TIMESTAMPS_FILE)):
+            self.timestamps = np.load(os.path.join(directory, TIMESTAMPS_FILE))[:count]
+        self.outputs = None
+        if os.path.exists(os.path.join(directory, OUTPUTS_FILE)):
+            with np.load(os.path.join(directory, OUTPUTS_FILE)) as outputs:
+                self.outputs = {name: outputs[name] for name in outputs.files}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def next_frames(self, rate='native'):
+        '''
+        Yield the frames, at the rate they were recorded ('native') or as fast as they are asked for ('max').
+        '''
+        start_time = time.time()
+        for index in range(len(self.frames)):
+            if rate == 'native' and self.timestamps is not None and index < len(self.timestamps):
+                delay = start_time + self.timestamps[index] - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            yield self.frames[index]
+
+    def frame_index(self, frame):
+        '''
+        Return the index of a replayed frame, found from its address in the memory-mapped file.
+        '''
+        index, remainder = divmod(frame.ctypes.data - self.frames.ctypes.data, self.frames[0].nbytes)
+        if remainder != 0 or not 0 <= index < len(self.frames):
+            raise ValueError("The replayed stages only work on the frames of their recording.")
+        return index
+
+    def output(self, name, frame):
+        '''
+        Return the recorded output of the frame, or None if it was not found.
+        '''
+        if self.outputs is None:
+            raise ValueError("The outputs of the models were not recorded.")
+        value = self.outputs[name][self.frame_index(frame)]
+        return None if np.isnan(value).any() else value
+
+
+class Replayed_Model:
+    '''
+    Common part of the stand-ins of the models : nothing to load, and the outputs of the frame given to
+    start_async are returned by wait.
+    '''
+    def __init__(self, replay):
+        self.replay = replay
+        # frame of each infer request
+        self.frames = {}
+
+    def read_model(self):
+        pass
+
+    def load_model(self, num_requests=1, batch_size=1, config=None):
+        pass
+
+
+class Replayed_Face_Detection(Replayed_Model):
+    def predict(self, image, mirror=False):
+        box = self.get_face_box(image, None)
+        return None if box is None else crop(image, box, mirror)
+
+    def start_async(self, image, request_id=0, mirror=False):
+        self.frames[request_id] = image
+
+    def wait(self, request_id=0):
+        # the coordinates are not needed, the boxes are those recorded for the frame
+        return None
+
+    def predict_batch(self, images, mirror=False):
+        return [None] * len(images)
+
+    def request_latency(self, request_id=0):
+        return 0.0
+
+    def get_face_box(self, image, coords):
+        boxes = self.get_face_boxes(image, coords)
+        return boxes[0] if boxes else None
+
+    def get_face_boxes(self, image, coords):
+        box = self.replay.output('face_box', image)
+        return [] if box is None else [tuple(int(value) for value in box)]
+
+
+class Replayed_Facial_Landmarks_Detection(Replayed_Model):
+    def predict(self, image, box, mirror=False):
+        self.start_async(image, box)
+        return self.wait(box)
+
+    def start_async(self, image, box, request_id=0, mirror=False):
+        self.frames[request_id] = image
+
+    def wait(self, box, request_id=0):
+        image = self.frames[request_id]
+        left_eye_box = self.replay.output('left_eye_box', image)
+        right_eye_box = self.replay.output('right_eye_box', image)
+        return (None if left_eye_box is None else tuple(left_eye_box),
+                None if right_eye_box is None else tuple(right_eye_box),
+                self.replay.output('landmarks', image))
+
+    def predict_batch(self, images, boxes, mirror=False):
+        return [self.predict(image, box) for image, box in zip(images, boxes)]
+
+
+class Replayed_Head_Pose_Estimation(Replayed_Model):
+    def predict(self, image, box, mirror=False):
+        self.start_async(image, box)
+        return self.wait()
+
+    def start_async(self, image, box, request_id=0, mirror=False):
+        self.frames[request_id] = image
+
+    def wait(self, request_id=0):
+        angles = self.replay.output('head_pose_angles', self.frames[request_id])
+        return None if angles is None else angles.reshape(1, 3)
+
+    def predict_batch(self, images, boxes, mirror=False):
+        angles = [self.predict(image, box) for image, box in zip(images, boxes)]
+        return np.concatenate([np.zeros((1, 3)) if face_angles is None else face_angles for face_angles in angles])
+
+
+class Replayed_Gaze_Estimation(Replayed_Model):
+    def predict(self, image, left_eye_box, right_eye_box, head_pose_angles, mirror=False):
+        self.start_async(image, left_eye_box, right_eye_box, head_pose_angles)
+        return self.wait()
+
+    def start_async(self, image, left_eye_box, right_eye_box, head_pose_angles, request_id=0, mirror=False):
+        self.frames[request_id] = image
+
+    def wait(self, request_id=0):
+        return self.replay.output('gaze_vector', self.frames[request_id])
+
+    def predict_batch(self, images, left_eye_boxes, right_eye_boxes, head_pose_angles, mirror=False):
+        return [self.predict(image, None, None, None) for image in images]
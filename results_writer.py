@@ -0,0 +1,78 @@
+'''
+This class writes the outputs of the models, one row per frame (or image), to a columnar file.
+The format is chosen from the file extension :
+- '.csv' : the rows are streamed to the file as they come,
+- '.npz' : one numpy array per column, saved when the writer is closed.
+
+Sample usage:
+    writer = Results_Writer('results.csv')
+    writer.write({'frame_index': 0, 'gaze_x': 0.1, ...})
+    writer.close()
+'''
+import csv
+import os
+
+import numpy as np
+
+COLUMNS = ['frame_index',
+           'face_x', 'face_y', 'face_w', 'face_h',
+           'left_eye_x', 'left_eye_y', 'right_eye_x', 'right_eye_y', 'nose_x', 'nose_y',
+           'left_mouth_x', 'left_mouth_y', 'right_mouth_x', 'right_mouth_y',
+           'yaw', 'pitch', 'roll',
+           'gaze_x', 'gaze_y', 'gaze_z',
+           'face_detection_time', 'landmarks_time', 'head_pose_time', 'gaze_time']
+
+
+class Results_Writer:
+    def __init__(self, path, columns=COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.format = os.path.splitext(path)[1].lower()
+        if self.format == '.csv':
+            self.file = open(path, 'w', newline='')
+            self.writer = csv.DictWriter(self.file, fieldnames=columns, restval='')
+            self.writer.writeheader()
+        elif self.format == '.npz':
+            self.values = {column: [] for column in columns}
+        else:
+            raise ValueError("Unknown results file format: " + self.format + " (use .csv or .npz)")
+        self.rows = 0
+
+    def write(self, row):
+        '''
+        Write a row, given as a dict of column name -> value. Missing values are left empty (NaN in a npz file).
+        '''
+        if self.format == '.csv':
+            self.writer.writerow(row)
+        else:
+            for column in self.columns:
+                self.values[column].append(row.get(column, np.nan))
+        self.rows += 1
+
+    def close(self):
+        if self.format == '.csv':
+            self.file.close()
+        else:
+            np.savez(self.path, **{column: np.array(values) for column, values in self.values.items()})
+
+
+def result_row(result, times=None):
+    '''
+    Return the row of a Frame_Result, with the optional per stage times (dict of column name -> seconds).
+    '''
+    row = {'frame_index': result.frame_index}
+    if result.face_box is not None:
+        row.update(zip(('face_x', 'face_y', 'face_w', 'face_h'), result.face_box))
+    if result.landmarks is not None:
+        # landmarks are stored in the frame coordinates
+        x, y = result.face_box[:2]
+        for index, (landmark_x, landmark_y) in enumerate(result.landmarks):
+            row[COLUMNS[5 + 2 * index]] = x + float(landmark_x)
+            row[COLUMNS[6 + 2 * index]] = y + float(landmark_y)
+    if result.head_pose_angles is not None:
+        row.update(zip(('yaw', 'pitch', 'roll'), (float(angle) for angle in result.head_pose_angles.ravel())))
+    if result.gaze_vector is not None:
+        row.update(zip(('gaze_x', 'gaze_y', 'gaze_z'), (float(value) for value in result.gaze_vector)))
+    if times is not None:
+        row.update(times)
+    return row
@@ -0,0 +1,49 @@
+'''
+These are helpers to summarize the performance of a run : latency percentiles and peak memory.
+'''
+import sys
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+def latency_summary(values, histogram_bins=20):
+    '''
+    Return a dict summarizing a list of latencies (in seconds) : count, mean, p50, p95, p99, max and a histogram.
+    All the values are None if the list is empty.
+    '''
+    if len(values) == 0:
+        summary = {'count': 0, 'mean': None, 'max': None, 'histogram': None}
+        summary.update({'p' + str(percentile): None for percentile in PERCENTILES})
+        return summary
+    values = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(values, bins=histogram_bins)
+    summary = {'count': int(len(values)), 'mean': float(values.mean()), 'max': float(values.max()),
+               'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()}}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary['p' + str(percentile)] = float(value)
+    return summary
+
+
+def format_summary(summary):
+    '''
+    Return a one line text of a latency summary, in milliseconds.
+    '''
+    if summary['count'] == 0:
+        return "no value"
+    return "mean {:.2f} ms / p50 {:.2f} ms / p95 {:.2f} ms / p99 {:.2f} ms ({} values)".format(
+        summary['mean'] * 1000, summary['p50'] * 1000, summary['p95'] * 1000, summary['p99'] * 1000, summary['count'])
+
+
+def peak_rss_kb():
+    '''
+    Return the peak resident memory of the process in KB (None if it can not be measured on this platform).
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
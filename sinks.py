@@ -0,0 +1,227 @@
+'''
+These are the sinks of the processed frames, each running in its own thread so that the display and the video
+encoding never add to the latency of the frames :
+- Preview_Sink : displays the detected face in a window,
+- Null_Sink : does nothing, to run headless,
+- Video_Sink : writes the full frames, annotated with the face box, the eyes landmarks, the head pose axes
+  and the gaze arrows, to a video file.
+
+The inference thread only takes a snapshot of what the sink needs from a Frame_Result (the frames in the pipeline are
+not copied, and are reused by the InputFeeder). A Sink_Thread has a queue of queue_size snapshots : when the sink is
+late and its queue is full, the new frames are dropped before any copy.
+An error of a sink (e.g. no display for the preview) stops its thread and closes the sink : the error is printed by
+the next put, on the calling thread, and kept in the statistics.
+
+Sample usage:
+    sink = Sink_Thread(Video_Sink('annotated.mp4', 25))
+    sink.put(result)
+    sink.close()
+    print(sink.stats())
+'''
+import math
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+QUEUE_SIZE = 2
+# colors of the annotations (BGR)
+FACE_COLOR = (0, 255, 0)
+LANDMARKS_COLOR = (0, 255, 255)
+GAZE_COLOR = (255, 0, 255)
+AXES_COLORS = [(0, 0, 255), (0, 255, 0), (255, 0, 0)]
+
+
+class Null_Sink:
+    '''
+    Sink doing nothing, for the headless runs.
+    '''
+    name = 'null'
+
+    def snapshot(self, result):
+        return None
+
+    def write(self, item):
+        pass
+
+    def close(self):
+        pass
+
+
+class Preview_Sink:
+    '''
+    Display the face of each frame where a gaze vector was found.
+    '''
+    name = 'preview'
+
+    def snapshot(self, result):
+        return None if result.gaze_vector is None else result.face_image()
+
+    def write(self, face):
+        cv2.imshow("Detected face", face)
+        cv2.waitKey(1)
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+
+class Video_Sink:
+    '''
+    Write the annotated frames to a video file, opened with the size of the first frame.
+    '''
+    name = 'video'
+
+    def __init__(self, path, fps=25):
+        self.path = path
+        self.fps = fps
+        self.writer = None
+
+    def snapshot(self, result):
+        # the frame is copied already mirrored, the annotations being in the mirrored frame coordinates
+        frame = cv2.flip(result.frame, 1) if result.mirror else result.frame.copy()
+        return (frame, result.face_box, result.landmarks, result.left_eye_box, result.right_eye_box,
+                result.head_pose_angles, result.gaze_vector)
+
+    def write(self, item):
+        frame = annotate(*item)
+        if self.writer is None:
+            fourcc = cv2.VideoWriter_fourcc(*('MJPG' if self.path.lower().endswith('.avi') else 'mp4v'))
+            self.writer = cv2.VideoWriter(self.path, fourcc, self.fps, (frame.shape[1], frame.shape[0]))
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+def box_center(box):
+    x, y, w, h = box
+    return x + w / 2, y + h / 2
+
+
+def annotate(frame, face_box, landmarks, left_eye_box, right_eye_box, head_pose_angles, gaze_vector):
+    '''
+    Draw the outputs of the models on the frame, and return it.
+    '''
+    if face_box is None:
+        return frame
+    x, y, w, h = [int(value) for value in face_box]
+    cv2.rectangle(frame, (x, y), (x + w, y + h), FACE_COLOR, 2)
+    if landmarks is not None:
+        for landmark_x, landmark_y in landmarks:
+            cv2.circle(frame, (int(x + landmark_x), int(y + landmark_y)), 3, LANDMARKS_COLOR, -1)
+    if head_pose_angles is not None:
+        draw_head_pose(frame, box_center(face_box), np.ravel(head_pose_angles), w / 2)
+    if gaze_vector is not None and left_eye_box is not None and right_eye_box is not None:
+        for eye_box in (left_eye_box, right_eye_box):
+            eye_x, eye_y = box_center(eye_box)
+            end = (int(eye_x + gaze_vector[0] * w / 2), int(eye_y - gaze_vector[1] * w / 2))
+            cv2.arrowedLine(frame, (int(eye_x), int(eye_y)), end, GAZE_COLOR, 2)
+    return frame
+
+
+def draw_head_pose(frame, center, angles, length):
+    '''
+    Draw the three axes of the head, rotated by the head pose angles (yaw, pitch, roll in degrees).
+    '''
+    yaw, pitch, roll = [math.radians(angle) for angle in angles]
+    rotation_x = np.array([[1, 0, 0], [0, math.cos(pitch), -math.sin(pitch)], [0, math.sin(pitch), math.cos(pitch)]])
+    rotation_y = np.array([[math.cos(yaw), 0, -math.sin(yaw)], [0, 1, 0], [math.sin(yaw), 0, math.cos(yaw)]])
+    rotation_z = np.array([[math.cos(roll), -math.sin(roll), 0], [math.sin(roll), math.cos(roll), 0], [0, 0, 1]])
+    rotation = rotation_z @ rotation_y @ rotation_x
+    center_x, center_y = center
+    # each column is an axis of the head, drawn with an orthographic projection
+    for axis, color in zip((rotation * length).T, AXES_COLORS):
+        cv2.line(frame, (int(center_x), int(center_y)), (int(center_x + axis[0]), int(center_y + axis[1])), color, 2)
+
+
+class Sink_Thread:
+    '''
+    Run a sink in its own thread, with a bounded queue of snapshots.
+    '''
+    def __init__(self, sink, queue_size=QUEUE_SIZE):
+        self.sink = sink
+        self.queue_size = queue_size
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.running = True
+        # error which stopped the sink, and whether it was reported
+        self.error = None
+        self.error_reported = False
+        # statistics
+        self.written = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.thread = threading.Thread(target=self.consume, daemon=True)
+        self.thread.start()
+
+    def put(self, result):
+        '''
+        Give the result of a frame to the sink. Never blocks : the frame is dropped if the queue is full.
+        '''
+        if self.error is not None:
+            self.report_error()
+            return
+        with self.condition:
+            if len(self.queue) >= self.queue_size:
+                self.dropped += 1
+                return
+        item = self.sink.snapshot(result)
+        if item is None:
+            return
+        with self.condition:
+            self.queue.append(item)
+            self.max_depth = max(self.max_depth, len(self.queue))
+            self.condition.notify()
+
+    def consume(self):
+        '''
+        Body of the sink thread : write the snapshots until the sink is closed and its queue is empty.
+        '''
+        try:
+            while True:
+                with self.condition:
+                    while self.running and not self.queue:
+                        self.condition.wait()
+                    if not self.queue:
+                        break
+                    item = self.queue.popleft()
+                self.sink.write(item)
+                self.written += 1
+        except Exception as error:
+            self.error = error
+        finally:
+            with self.condition:
+                self.queue.clear()
+            try:
+                self.sink.close()
+            except Exception as error:
+                if self.error is None:
+                    self.error = error
+
+    def close(self):
+        '''
+        Write the snapshots left in the queue, then close the sink.
+        '''
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        if self.error is not None:
+            self.report_error()
+
+    def report_error(self):
+        if not self.error_reported:
+            self.error_reported = True
+            print("The", self.sink.name, "sink stopped :", repr(self.error))
+
+    def stats(self):
+        '''
+        Return the sink statistics as a dict.
+        '''
+        with self.condition:
+            depth = len(self.queue)
+        return {'sink': self.sink.name, 'queue_size': self.queue_size, 'queue_depth': depth,
+                'max_queue_depth': self.max_depth, 'written': self.written, 'dropped': self.dropped,
+                'error': repr(self.error) if self.error is not None else None}
@@ -0,0 +1,73 @@
+'''
+This class records the phases of the application startup (imports, models reading and compilation,
+capture opening, ...) up to the first pointer move, so that the time to the first cursor move can be tracked.
+
+Sample usage:
+    with timeline.phase('IR read'):
+        read_the_model()
+    timeline.mark('first frame')
+    timeline.report()
+
+The times are relative to the import of this module, which main.py does first.
+'''
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Startup_Timeline:
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.time()
+        # (name, start, end) with times relative to the origin
+        self.phases = []
+        self.lock = threading.Lock()
+
+    def add(self, name, start, end):
+        '''
+        Record a phase from its absolute start and end times.
+        '''
+        with self.lock:
+            self.phases.append((name, start - self.origin, end - self.origin))
+
+    @contextmanager
+    def phase(self, name):
+        '''
+        Record the phase corresponding to the execution of the with block.
+        '''
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.time())
+
+    def mark(self, name):
+        '''
+        Record an event happening now, only the first time it happens.
+        '''
+        now = time.time() - self.origin
+        with self.lock:
+            if not any(phase[0] == name for phase in self.phases):
+                self.phases.append((name, now, now))
+
+    def elapsed(self, name):
+        '''
+        Return the time from the origin to the end of the phase (None if it did not happen).
+        '''
+        with self.lock:
+            for phase in self.phases:
+                if phase[0] == name:
+                    return phase[2]
+        return None
+
+    def report(self):
+        '''
+        Print the phases in their starting order.
+        '''
+        print("Startup timeline (seconds from the start) :")
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        for name, start, end in phases:
+            print("    {:<45} {:8.3f} -> {:8.3f} ({:.3f})".format(name, start, end, end - start))
+
+
+timeline = Startup_Timeline()
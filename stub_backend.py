@@ -0,0 +1,172 @@
+'''
+This is a stub of the OpenVINO networks, used with the 'STUB' device to exercise the application and the benchmarks
+on machines without OpenVINO or without the Intel models.
+
+The stub networks have the inputs and outputs of the four models used (recognized from the model file name)
+and return fixed plausible outputs (one face in the middle of each image, looking slightly to the right).
+Each inference takes a set latency, without using the CPU : infer requests started at the same time run in parallel.
+The latency grows with the number of input pixels (batch included) relative to the default input shapes.
+
+The latencies (in seconds) can be changed with set_latencies, e.g. set_latencies({'face_detection': 0.02}).
+'''
+import threading
+import time
+
+import numpy as np
+
+# default latency of each model, close to those measured on a CPU
+LATENCIES = {'face_detection': 0.008, 'landmarks': 0.001, 'head_pose': 0.0015, 'gaze': 0.0015}
+
+# inputs and outputs shapes of each model, with a batch of 1
+MODELS = {
+    'face_detection': ({'data': [1, 3, 384, 672]}, {'detection_out': [1, 1, 200, 7]}),
+    'landmarks': ({'0': [1, 3, 48, 48]}, {'95': [1, 10, 1, 1]}),
+    'head_pose': ({'data': [1, 3, 60, 60]}, {'angle_p_fc': [1, 1], 'angle_r_fc': [1, 1], 'angle_y_fc': [1, 1]}),
+    'gaze': ({'head_pose_angles': [1, 3], 'left_eye_image': [1, 3, 60, 60], 'right_eye_image': [1, 3, 60, 60]},
+             {'gaze_vector': [1, 3]})
+}
+
+# eyes, nose tip and mouth corners, normalized in the face
+LANDMARKS = [0.3, 0.35, 0.7, 0.35, 0.5, 0.6, 0.35, 0.8, 0.65, 0.8]
+GAZE_VECTOR = [0.1, -0.05, -0.99]
+
+_lock = threading.Lock()
+
+
+def set_latencies(latencies):
+    '''
+    Change the latency of some models, given as a dict of model kind -> seconds.
+    '''
+    with _lock:
+        LATENCIES.update(latencies)
+
+
+def model_kind(model_structure):
+    '''
+    Return the kind of model from its file name.
+    '''
+    name = model_structure.replace('\\', '/').split('/')[-1]
+    for pattern, kind in (('face-detection', 'face_detection'), ('landmarks', 'landmarks'),
+                          ('head-pose', 'head_pose'), ('gaze', 'gaze')):
+        if pattern in name:
+            return kind
+    raise ValueError("The stub device does not know the model " + model_structure)
+
+
+class Stub_Data:
+    '''
+    Input or output description, with its shape.
+    '''
+    def __init__(self, shape):
+        self.shape = list(shape)
+
+
+class Stub_Network:
+    '''
+    Stub of a network read from IR files.
+    '''
+    def __init__(self, model_structure):
+        self.kind = model_kind(model_structure)
+        inputs, outputs = MODELS[self.kind]
+        self.inputs = {name: Stub_Data(shape) for name, shape in inputs.items()}
+        self.outputs = {name: Stub_Data(shape) for name, shape in outputs.items()}
+
+    def input_scale(self):
+        '''
+        Return the number of input pixels relative to the default input shapes.
+        '''
+        default_inputs = MODELS[self.kind][0]
+        for name, data in self.inputs.items():
+            if len(data.shape) == 4:
+                default_shape = default_inputs[name]
+                return data.shape[0] * data.shape[2] * data.shape[3] / (default_shape[2] * default_shape[3])
+        return 1.0
+
+    @property
+    def batch_size(self):
+        return next(iter(self.inputs.values())).shape[0]
+
+    def reshape(self, shapes):
+        for name, shape in shapes.items():
+            self.inputs[name].shape = list(shape)
+        batch_size = self.batch_size
+        for name, output in self.outputs.items():
+            if self.kind == 'face_detection':
+                # the detections of all the images of the batch are in the same output
+                output.shape = [1, 1, 200 * batch_size, 7]
+            else:
+                output.shape = [batch_size] + output.shape[1:]
+
+    def make_outputs(self):
+        '''
+        Return the fixed outputs of the network.
+        '''
+        batch_size = self.batch_size
+        outputs = {name: np.zeros(output.shape, dtype=np.float32) for name, output in self.outputs.items()}
+        if self.kind == 'face_detection':
+            detections = outputs['detection_out'][0][0]
+            detections[:, 0] = -1
+            for image_id in range(batch_size):
+                detections[image_id] = [image_id, 1, 0.99, 0.35, 0.2, 0.65, 0.8]
+        elif self.kind == 'landmarks':
+            outputs['95'][:, :, 0, 0] = LANDMARKS
+        elif self.kind == 'gaze':
+            outputs['gaze_vector'][:] = GAZE_VECTOR
+        return outputs
+
+
+class Stub_Request:
+    '''
+    Stub of an infer request : an inference ends latency seconds after it started.
+    '''
+    def __init__(self, network):
+        self.kind = network.kind
+        self.scale = network.input_scale()
+        self.outputs = network.make_outputs()
+        self.end_time = 0.0
+        self.duration = 0.0
+
+    @property
+    def latency(self):
+        '''
+        Inference time of the last inference in milliseconds, as for the OpenVINO infer requests.
+        '''
+        return self.duration * 1000
+
+    def async_infer(self, inputs=None):
+        with _lock:
+            self.duration = LATENCIES[self.kind] * self.scale
+        self.end_time = time.time() + self.duration
+
+    def infer(self, inputs=None):
+        self.async_infer(inputs)
+        self.wait()
+
+    def wait(self, timeout=-1):
+        remaining = self.end_time - time.time()
+        if remaining > 0:
+            time.sleep(remaining)
+        return 0
+
+    def get_perf_counts(self):
+        microseconds = int(self.duration * 1e6)
+        return {'stub_' + self.kind: {'status': 'EXECUTED', 'layer_type': 'Stub', 'exec_type': 'stub',
+                                      'real_time': microseconds, 'cpu_time': 0}}
+
+
+class Stub_Executable_Network:
+    '''
+    Stub of a network loaded on a device, with num_requests infer requests.
+    '''
+    def __init__(self, network, num_requests=1):
+        self.requests = [Stub_Request(network) for _ in range(num_requests)]
+
+    def start_async(self, request_id, inputs=None):
+        self.requests[request_id].async_infer(inputs)
+
+    def infer(self, inputs=None):
+        self.requests[0].infer(inputs)
+        return self.requests[0].outputs
+
+    def export(self, model_file):
+        raise NotImplementedError("The stub networks can not be exported")